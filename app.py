@@ -1,9 +1,69 @@
 import asyncio
 import logging
+import re
 import sys
-from loader import dp, bot
-from handlers.users import start, menu, order, inline
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from loader import dp, bot, storage, send_scheduler
+from handlers.users import start, buttons, menu, order, inline
 from handlers import admin
+from data import config
+from middlewares.ordering import OrderedDispatchMiddleware
+from middlewares.metrics import HandlerMetricsMiddleware
+
+
+def check_webhook_config():
+    """Refuse to serve webhooks without a secret token or a public URL."""
+    if not config.WEBHOOK_SECRET:
+        # Without it anyone who finds the path can post forged updates, e.g. order accept callbacks
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_SECRET")
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", config.WEBHOOK_SECRET):
+        raise RuntimeError("WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -")
+    if not config.WEBHOOK_BASE_URL:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_BASE_URL")
+
+
+async def run_webhook():
+    """Serve updates through an embedded aiohttp server instead of long polling.
+
+    Run exactly one instance per bot token. FSM storage (the SQLite file or
+    memory), per-chat update ordering, the notification outbox, the send rate
+    limits and all caches live in this process. Instances behind a round-robin
+    load balancer would each see part of a user's updates and split their
+    state. Webhook mode is for a single instance behind a TLS-terminating proxy.
+    Scaling out would need sticky-by-chat routing plus shared FSM storage and
+    outbox, which this bot does not provide.
+    """
+    logger = logging.getLogger(__name__)
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.WEBHOOK_SECRET,
+        handle_in_background=True,
+    ).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    # Disable when the webhook is registered out of band, e.g. by a deploy script
+    if config.WEBHOOK_SET_ON_STARTUP:
+        await bot.set_webhook(
+            url=f"{config.WEBHOOK_BASE_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+            secret_token=config.WEBHOOK_SECRET,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBAPP_HOST, port=config.WEBAPP_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {config.WEBAPP_HOST}:{config.WEBAPP_PORT}{config.WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
 
 async def main():
     logging.basicConfig(
@@ -13,20 +73,91 @@ async def main():
     logger = logging.getLogger(__name__)
     logger.info("Starting bot...")
 
+    if config.BOT_MODE == "webhook":
+        check_webhook_config()
+
     from utils.api import api_client
+    from utils.catalog import catalog_index
+    from utils.media import file_id_cache, image_fetcher
+    from utils.prewarm import image_prewarmer
+    from utils.outbox import order_outbox
+    from utils.localization import watch_locales
+    from utils.collectors import register_collectors
+    from utils.metrics import start_metrics_server
+    from utils.storage import SQLiteStorage
+
+    # Restore persisted FSM state before taking updates
+    if isinstance(storage, SQLiteStorage):
+        await storage.start()
+
+    # Persist new product photo file_ids in batches
+    file_id_cache.start()
 
     # Admin Login
     await api_client.admin_login()
 
+    # Re-warm product photos whenever a new catalog snapshot lands
+    catalog_index.add_listener(lambda: image_prewarmer.schedule(bot))
+
+    # Deliver admin order notifications, including any left from the last run
+    order_outbox.start(bot)
+
+    pool_stats_task = None
+    if config.BACKEND_POOL_STATS_INTERVAL > 0:
+        pool_stats_task = asyncio.create_task(api_client.log_pool_stats(config.BACKEND_POOL_STATS_INTERVAL))
+
+    # Pick up edits to data/locales.json without a restart
+    locales_task = None
+    if config.LOCALES_RELOAD_INTERVAL > 0:
+        locales_task = asyncio.create_task(watch_locales(config.LOCALES_RELOAD_INTERVAL))
+
+    # Catalog snapshot for navigation; refreshed in the background
+    await catalog_index.load()
+    catalog_index.start()
+
+    # Parallel across chats, strictly ordered within a chat
+    ordering = OrderedDispatchMiddleware(
+        config.UPDATE_WORKERS,
+        config.UPDATE_QUEUE_PER_CHAT,
+        unbounded_chats=(config.ADMIN_GROUP_ID,),  # Accept/decline taps must never be dropped
+    )
+    dp.update.outer_middleware(ordering)
+
+    # Per-handler latency; inner middlewares on the dispatcher apply to every included router
+    for event_name in ("message", "callback_query", "inline_query", "chosen_inline_result"):
+        dp.observers[event_name].middleware(HandlerMetricsMiddleware(event_name))
+
+    metrics_runner = None
+    if config.METRICS_PORT > 0:
+        register_collectors(storage, ordering=ordering, send_scheduler=send_scheduler)
+        metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+
     dp.include_router(inline.router)  # Must be first to catch inline queries
     dp.include_router(admin.router)   # Admin callback handlers
-    dp.include_router(menu.router)    # Menu button handlers
+    dp.include_router(buttons.router) # Keyboard buttons, one lookup via the locale reverse index
+    dp.include_router(menu.router)    # Menu state handlers
     dp.include_router(order.router)   # Order flow handlers
     dp.include_router(start.router)   # Start/registration handlers (LAST - has catch-all)
 
     try:
-        await dp.start_polling(bot)
+        if config.BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
+        if pool_stats_task:
+            pool_stats_task.cancel()
+        if locales_task:
+            locales_task.cancel()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await catalog_index.stop()
+        await image_prewarmer.stop()
+        await file_id_cache.stop()
+        await order_outbox.stop()
+        await image_fetcher.close()
+        await api_client.close()
         await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""
+Compare per-update routing cost of the old text-filter chain with the button table.
+
+    python -m benchmarks.dispatch [--updates 20000]
+
+Both dispatchers mirror the bot's router layout with no-op handlers, so the
+numbers are filter evaluation plus aiogram's own per-update overhead.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, Router, F
+from aiogram.filters import CommandStart
+from aiogram.types import Chat, Message, Update, User
+
+from states.registration import MenuState, OrderState, RegisterState
+
+USER_ID = 42
+
+
+async def noop(*args, **kwargs):
+    pass
+
+
+def _common_routers(menu: Router):
+    """Routers that are the same before and after: inline, FSM state handlers, start."""
+    inline = Router()
+    inline.message.register(noop, F.text.startswith("🔧 "))
+    inline.message.register(noop, F.text == "/start browse")
+
+    menu.message.register(noop, MenuState.language)
+    menu.message.register(noop, MenuState.comment)
+
+    order = Router()
+    order.message.filter(F.chat.type == "private")
+    order.message.register(noop, OrderState.group, ~F.text.startswith("/"))
+    order.message.register(noop, OrderState.product, ~F.text.startswith("/"))
+    order.message.register(noop, OrderState.amount, ~F.text.startswith("/"))
+    order.message.register(noop, OrderState.cart, ~F.text.startswith("/"))
+
+    start = Router()
+    start.message.filter(F.chat.type == "private")
+    start.message.register(noop, CommandStart())
+    start.message.register(noop, RegisterState.language)
+    start.message.register(noop, RegisterState.phone, F.contact)
+    start.message.register(noop, F.text)
+    return inline, order, start
+
+
+def build_before() -> Dispatcher:
+    menu = Router()
+    menu.message.filter(F.chat.type == "private")
+    menu.message.register(noop, F.text == "📱 Kontaktni yuborish")
+    menu.message.register(noop, F.text == "📱 Отправить контакт")
+    menu.message.register(noop, F.text == "📱 Share Contact")
+    menu.message.register(noop, lambda msg: msg.text in ["📞 Biz bilan aloqa", "📞 Связаться с нами", "📞 Contact Us"])
+    menu.message.register(noop, lambda msg: msg.text in ["⚙️ Sozlamalar", "⚙️ Настройки", "⚙️ Settings"])
+    menu.message.register(noop, lambda msg: msg.text in ["✍️ Izoh qoldirish", "✍️ Оставить комментарий", "✍️ Leave a Comment"])
+    menu.message.register(noop, lambda msg: msg.text in ["📜 Buyurtmalar tarixi", "📜 История заказов", "📜 Order History"])
+    menu.message.register(noop, lambda msg: msg.text in ["📦 Buyurtma berish", "📦 Заказать", "📦 Order"])
+    inline, order, start = _common_routers(menu)
+    order.message.register(noop, F.text.in_(["🛍 Buyurtma berish", "🛍 Заказать", "🛍 Order"]))
+    # Registered first in the real order router
+    order.message.handlers.insert(0, order.message.handlers.pop())
+
+    dp = Dispatcher()
+    dp.include_routers(inline, menu, order, start)
+    return dp
+
+
+def build_after() -> Dispatcher:
+    from handlers.users.buttons import ButtonTable, dispatch_button
+
+    table = ButtonTable()
+    for key in ("contact_button", "btn_contact", "btn_settings", "btn_comment", "btn_history", "btn_order"):
+        table.handler(key)(noop)
+    table.handler(aliases=["🛍 Buyurtma berish", "🛍 Заказать", "🛍 Order"])(noop)
+    buttons = Router()
+    buttons.message.filter(F.chat.type == "private")
+    buttons.message.register(dispatch_button, F.text, table)
+
+    menu = Router()
+    menu.message.filter(F.chat.type == "private")
+    inline, order, start = _common_routers(menu)
+
+    dp = Dispatcher()
+    dp.include_routers(inline, buttons, menu, order, start)
+    return dp
+
+
+def make_update(update_id: int, text: str) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=USER_ID, type="private"),
+            from_user=User(id=USER_ID, is_bot=False, first_name="Bench"),
+            text=text,
+        ),
+    )
+
+
+# (text, FSM state): menu presses from the main menu, catalog taps, amounts and cart actions
+WORKLOAD = [
+    ("📦 Заказать", MenuState.main),
+    ("📜 История заказов", MenuState.main),
+    ("📞 Contact Us", MenuState.main),
+    ("Радиаторы", OrderState.group),
+    ("Радиатор алюминиевый 500/10 секций", OrderState.group),
+    ("Далее ➡️", OrderState.group),
+    ("3", OrderState.amount),
+    ("🚖 Оформить заказ", OrderState.cart),
+]
+
+
+async def run(dp: Dispatcher, bot: Bot, updates: int) -> float:
+    from aiogram.fsm.storage.base import StorageKey
+
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+    batch = [(make_update(i, text), state) for i, (text, state) in enumerate(WORKLOAD)]
+    started = time.perf_counter()
+    for i in range(updates):
+        update, state = batch[i % len(batch)]
+        await dp.storage.set_state(key, state)
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / updates * 1e6
+
+
+async def amain(updates: int):
+    bot = Bot("123456:bench")
+    for name, build in (("before", build_before), ("after", build_after)):
+        dp = build()
+        await run(dp, bot, 500)  # warm up
+        print(f"{name:>6}: {await run(dp, bot, updates):7.1f} us per update")
+    await bot.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(amain(args.updates))
+
+
+if __name__ == "__main__":
+    main()
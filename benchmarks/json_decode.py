@@ -0,0 +1,78 @@
+"""
+Compare JSON decode time of available codecs on a realistic catalog payload.
+
+    python -m benchmarks.json_decode [--products 10000] [--repeat 20]
+"""
+
+import argparse
+import json
+import statistics
+import time
+import uuid
+
+
+def build_catalog_payload(count: int) -> bytes:
+    """A /products?group_id=...&limit=10000 style response."""
+    group_id = str(uuid.uuid4())
+    items = []
+    for i in range(count):
+        items.append({
+            "id": str(uuid.uuid4()),
+            "iiko_id": str(uuid.uuid4()),
+            "group_id": group_id,
+            "organization_id": str(uuid.uuid4()),
+            "name_uz": f"Alyuminiy radiator 500/{i} seksiya",
+            "name_ru": f"Радиатор алюминиевый 500/{i} секций",
+            "name_en": f"Aluminium radiator 500/{i} sections",
+            "description_uz": "Issiqlik quvvati 190 Vt, ish bosimi 16 bar. " * 3,
+            "description_ru": "Теплоотдача 190 Вт, рабочее давление 16 бар. " * 3,
+            "description_en": "Heat output 190 W, working pressure 16 bar. " * 3,
+            "price": f"{12.5 + i % 300:.2f}",
+            "images": [f"http://localhost:8002/static/products/{uuid.uuid4()}.jpg"],
+            "is_active": True,
+            "created_at": "2025-01-15T10:24:31.512Z",
+            "updated_at": "2025-02-01T08:00:00.000Z",
+        })
+    return json.dumps({"items": items, "total": count, "skip": 0, "limit": 10000}, ensure_ascii=False).encode()
+
+
+def codecs():
+    yield "json", json.loads
+    try:
+        import orjson
+        yield "orjson", orjson.loads
+    except ImportError:
+        pass
+    try:
+        import ujson
+        yield "ujson", ujson.loads
+    except ImportError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from utils.json_codec import CODEC
+
+    payload = build_catalog_payload(args.products)
+    print(f"Payload: {args.products} products, {len(payload) / 1024 / 1024:.1f} MiB; active codec: {CODEC}")
+
+    baseline = None
+    for name, loads in codecs():
+        loads(payload)  # warm up
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            loads(payload)
+            timings.append((time.perf_counter() - started) * 1000)
+        median = statistics.median(timings)
+        baseline = baseline or median
+        print(f"{name:>7}: median {median:7.2f} ms  min {min(timings):7.2f} ms  ({baseline / median:.1f}x vs json)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure local search index build time and uncached per-keystroke query latency.
+
+    python -m benchmarks.search [--products 10000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+import uuid
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:bench")
+
+KINDS = [
+    ("Radiator", "Радиатор", "Radiator"),
+    ("Kran", "Кран", "Valve"),
+    ("Quvur", "Труба", "Pipe"),
+    ("Nasos", "Насос", "Pump"),
+    ("Qozon", "Котёл", "Boiler"),
+    ("Filtr", "Фильтр", "Filter"),
+    ("Mufta", "Муфта", "Coupling"),
+    ("Termostat", "Термостат", "Thermostat"),
+]
+MATERIALS = [
+    ("alyuminiy", "алюминиевый", "aluminium"),
+    ("bimetall", "биметаллический", "bimetal"),
+    ("po'lat", "стальной", "steel"),
+    ("mis", "медный", "copper"),
+    ("plastik", "пластиковый", "plastic"),
+]
+BRANDS = ["Rifar", "Global", "Sira", "Royal", "Grundfos", "Valtec", "Oventrop", "Danfoss", "Baxi", "Ariston"]
+
+QUERIES = [
+    "r", "ra", "rad", "radi", "radiator",
+    "радиатор 500", "радиатор алюм", "rifar 50", "nasos grun", "danfoss termostat",
+    "pipe 20", "кран шар", "qozon baxi 24", "radiatr", "termostat danfos",
+]
+
+
+def build_products(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    products = {}
+    for i in range(count):
+        kind = rng.choice(KINDS)
+        material = rng.choice(MATERIALS)
+        brand = rng.choice(BRANDS)
+        size = rng.choice([15, 20, 25, 32, 50, 300, 350, 500])
+        model = f"{brand[:2].upper()}{rng.randint(100, 9999)}"
+        product_id = str(uuid.uuid4())
+        products[product_id] = {
+            "id": product_id,
+            "name_uz": f"{brand} {material[0]} {kind[0].lower()} {size} {model}",
+            "name_ru": f"{kind[1]} {material[1]} {brand} {size} {model}",
+            "name_en": f"{brand} {material[2]} {kind[2].lower()} {size} {model}",
+            "description_ru": f"{kind[1]} {brand}, рабочее давление {rng.randint(6, 25)} бар",
+            "description_en": f"{kind[2]} by {brand}, working pressure {rng.randint(6, 25)} bar",
+        }
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from utils.search import SearchIndex
+
+    products = build_products(args.products)
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.build(products)
+    print(f"build: {(time.perf_counter() - started) * 1000:.1f} ms for {len(products)} products")
+
+    timings = []
+    for query in QUERIES:
+        runs = []
+        for _ in range(args.repeat):
+            index._query_cache.clear()
+            started = time.perf_counter()
+            results = index.search(query, limit=30)
+            runs.append((time.perf_counter() - started) * 1000)
+        elapsed = statistics.median(runs)
+        timings.append(elapsed)
+        top = results[0].get("name_en") if results else "-"
+        print(f"{query!r:>22}: {elapsed:6.2f} ms  {len(results):2d} results  top: {top}")
+    print(f"uncached query (median of {args.repeat} runs each): median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,3 +13,153 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
 
 # Admin group chat ID for order notifications
 ADMIN_GROUP_ID = int(os.getenv("ADMIN_GROUP_ID", "-1003559418523"))
+
+# Catalog cache (seconds). Entries older than TTL are served stale while
+# being refreshed in the background for up to CATALOG_CACHE_STALE_TTL more.
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_STALE_TTL = float(os.getenv("CATALOG_CACHE_STALE_TTL", "600"))
+
+# Catalog tree index refresh interval (seconds) and parallel fetches while loading
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "300"))
+CATALOG_LOAD_CONCURRENCY = int(os.getenv("CATALOG_LOAD_CONCURRENCY", "8"))
+
+# Local inline search falls back to the backend if the catalog snapshot is older than this (seconds)
+SEARCH_MAX_STALENESS = float(os.getenv("SEARCH_MAX_STALENESS", "1800"))
+
+# Persistent product image -> Telegram file_id mapping
+FILE_ID_CACHE_PATH = os.getenv("FILE_ID_CACHE_PATH", os.path.join(os.path.dirname(__file__), "file_ids.json"))
+FILE_ID_CACHE_FLUSH_INTERVAL = float(os.getenv("FILE_ID_CACHE_FLUSH_INTERVAL", "5"))  # Seconds between write-behind flushes
+
+# Product image fetching. Rewrites are "from=to" prefix pairs separated by commas,
+# used to reach the backend's public image URLs over the internal Docker network.
+IMAGE_URL_REWRITES = [
+    tuple(pair.split("=", 1))
+    for pair in os.getenv(
+        "IMAGE_URL_REWRITES",
+        "http://localhost:8002=http://app:8000,http://127.0.0.1:8002=http://app:8000"
+    ).split(",")
+    if "=" in pair
+]
+IMAGE_FETCH_CONCURRENCY = int(os.getenv("IMAGE_FETCH_CONCURRENCY", "10"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_POOL_LIMIT = int(os.getenv("IMAGE_POOL_LIMIT", "20"))
+
+# Image pre-warming: product photos are uploaded once to this private chat to
+# record their file_ids. Disabled when IMAGE_STORAGE_CHAT_ID is not set.
+IMAGE_STORAGE_CHAT_ID = int(os.getenv("IMAGE_STORAGE_CHAT_ID")) if os.getenv("IMAGE_STORAGE_CHAT_ID") else None
+# Uploads go through the send scheduler, so throughput is set by the storage
+# chat's rate, not by PREWARM_CONCURRENCY (which only overlaps downloads and
+# recompression). By default a group or channel id gets SEND_GROUP_RATE, i.e.
+# 20 uploads/min (~1200 products/hour), and a user chat SEND_CHAT_RATE, 1/s.
+# A private channel used only for storage can be given its own rate here
+# (uploads per second, 0 = the default for the chat type).
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "3"))
+PREWARM_UPLOAD_RATE = float(os.getenv("PREWARM_UPLOAD_RATE", "0"))
+PREWARM_UPLOAD_BURST = float(os.getenv("PREWARM_UPLOAD_BURST", "3"))
+PREWARM_RECOMPRESS = os.getenv("PREWARM_RECOMPRESS", "true").lower() == "true"
+PREWARM_MAX_SIDE = int(os.getenv("PREWARM_MAX_SIDE", "1280"))
+PREWARM_JPEG_QUALITY = int(os.getenv("PREWARM_JPEG_QUALITY", "85"))
+
+# FSM storage: "sqlite" (persistent, write-behind) or "memory"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_DB_PATH = os.getenv("FSM_DB_PATH", os.path.join(os.path.dirname(__file__), "fsm.sqlite3"))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1.0"))
+FSM_DURABILITY = os.getenv("FSM_DURABILITY", "normal")  # off | normal | full
+FSM_HOT_MAX = int(os.getenv("FSM_HOT_MAX", "50000"))
+FSM_WARMUP_HOURS = float(os.getenv("FSM_WARMUP_HOURS", "24"))
+
+# Update intake: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "100"))  # Updates processed concurrently
+UPDATE_QUEUE_PER_CHAT = int(os.getenv("UPDATE_QUEUE_PER_CHAT", "10"))  # Waiting updates per chat before dropping
+
+# Webhook mode. WEBHOOK_BASE_URL is the public URL Telegram calls (e.g. a TLS proxy in front of
+# WEBAPP_HOST:WEBAPP_PORT) and must be set. Single instance only: FSM, ordering and the outbox are per process.
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Required in webhook mode: A-Z, a-z, 0-9, _ and -
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBHOOK_SET_ON_STARTUP = os.getenv("WEBHOOK_SET_ON_STARTUP", "true").lower() == "true"
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# Alternative Bot API server, e.g. a local fake Telegram endpoint for testing
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# Refresh JWTs this many seconds before their `exp` claim
+TOKEN_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "60"))
+
+# Per-user login token cache; tokens without an `exp` claim are kept this long (seconds)
+USER_TOKEN_CACHE_SIZE = int(os.getenv("USER_TOKEN_CACHE_SIZE", "10000"))
+USER_TOKEN_DEFAULT_TTL = float(os.getenv("USER_TOKEN_DEFAULT_TTL", "900"))
+
+# User profile cache (get_user)
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+
+# Backend timeouts (seconds). Overrides are "METHOD /path-prefix=seconds" pairs separated by commas.
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "10"))
+BACKEND_TIMEOUT_OVERRIDES = [
+    (rule.split("=", 1)[0].strip(), float(rule.split("=", 1)[1]))
+    for rule in os.getenv(
+        "BACKEND_TIMEOUT_OVERRIDES",
+        "GET /products?search=3,GET /groups=15,GET /products?group_id=15,POST /orders=20"
+    ).split(",")
+    if "=" in rule
+]
+
+# Retries for idempotent calls: at most RETRY_MAX attempts extra, and retries
+# are limited to RETRY_BUDGET_RATIO of traffic (plus RETRY_MIN_PER_SECOND).
+RETRY_MAX = int(os.getenv("RETRY_MAX", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.2"))
+RETRY_BACKOFF_CAP = float(os.getenv("RETRY_BACKOFF_CAP", "2"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_MIN_PER_SECOND = float(os.getenv("RETRY_MIN_PER_SECOND", "1"))
+
+# Circuit breaker: opens when the error rate over the window reaches the threshold
+BREAKER_ERROR_THRESHOLD = float(os.getenv("BREAKER_ERROR_THRESHOLD", "0.5"))
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "20"))
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+
+# Backend HTTP connection pool
+BACKEND_POOL_LIMIT = int(os.getenv("BACKEND_POOL_LIMIT", "100"))
+BACKEND_POOL_LIMIT_PER_HOST = int(os.getenv("BACKEND_POOL_LIMIT_PER_HOST", "50"))
+BACKEND_KEEPALIVE_TIMEOUT = float(os.getenv("BACKEND_KEEPALIVE_TIMEOUT", "30"))
+BACKEND_DNS_TTL = int(os.getenv("BACKEND_DNS_TTL", "300"))
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3"))
+BACKEND_POOL_STATS_INTERVAL = float(os.getenv("BACKEND_POOL_STATS_INTERVAL", "300"))  # 0 disables logging
+
+# Outbound Telegram send limits (messages per second). Groups default to 20 per minute.
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))
+SEND_GROUP_BURST = float(os.getenv("SEND_GROUP_BURST", "3"))
+SEND_RETRY_MAX = int(os.getenv("SEND_RETRY_MAX", "3"))  # Resends after a retry_after (429) reply
+SEND_RETRY_AFTER_MAX = float(os.getenv("SEND_RETRY_AFTER_MAX", "60"))  # Longer flood waits are raised
+
+# Durable outbox for admin-group order notifications
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", os.path.join(os.path.dirname(__file__), "outbox.sqlite3"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))  # Then the job is dead-lettered
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "5"))
+OUTBOX_RETRY_CAP = float(os.getenv("OUTBOX_RETRY_CAP", "600"))
+OUTBOX_RETENTION_DAYS = float(os.getenv("OUTBOX_RETENTION_DAYS", "7"))  # Delivered jobs are kept this long
+
+# Order history: orders per page, and rendered pages cached per user
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "5000"))
+HISTORY_CACHE_TTL = float(os.getenv("HISTORY_CACHE_TTL", "600"))
+
+# Prebuilt catalog page keyboards kept in memory
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "2048"))
+
+# Seconds between checks of data/locales.json for changes; 0 disables hot reload
+LOCALES_RELOAD_INTERVAL = float(os.getenv("LOCALES_RELOAD_INTERVAL", "5"))
+
+# Prometheus metrics endpoint (GET /metrics); disabled unless METRICS_PORT is set
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
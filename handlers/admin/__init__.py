@@ -1,11 +1,17 @@
 """
 Admin handlers for order management via callback buttons.
-Handles Accept/Decline buttons from admin group.
+Handles Accept/Decline buttons from admin group, and the /outbox and
+/requeue commands for order notifications that could not be delivered.
 """
 
+from html import escape
+
 from aiogram import Router, types, F, Bot
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from utils.api import api_client
+from utils.history import invalidate_order_history
+from utils.outbox import order_outbox
 from data.config import ADMIN_GROUP_ID
 import logging
 
@@ -24,6 +30,8 @@ async def accept_order(callback: types.CallbackQuery):
         res = await api_client.update_order_status(order_id, "confirmed")
         
         if "error" not in res:
+            # Status shows in the customer's history; clear everyone's if the owner is unknown
+            invalidate_order_history(res.get("user_id"))
             order_number = res.get("order_number", "N/A")
             
             # Edit the message to show it's confirmed
@@ -59,6 +67,8 @@ async def decline_order(callback: types.CallbackQuery):
         res = await api_client.update_order_status(order_id, "declined")
         
         if "error" not in res:
+            # Status shows in the customer's history; clear everyone's if the owner is unknown
+            invalidate_order_history(res.get("user_id"))
             order_number = res.get("order_number", "N/A")
             
             # Edit the message to show it's declined
@@ -82,3 +92,38 @@ async def decline_order(callback: types.CallbackQuery):
     except Exception as e:
         logger.error(f"Error declining order: {e}")
         await callback.answer("Ошибка при отклонении заказа", show_alert=True)
+
+
+# Dead letters listed per /outbox reply, to stay within the message size limit
+DEAD_LETTERS_SHOWN = 20
+
+
+@router.message(Command("outbox"), F.chat.id == ADMIN_GROUP_ID)
+async def list_dead_letters(message: types.Message):
+    """List order notifications the outbox gave up on."""
+    dead = await order_outbox.dead_letters()
+    if not dead:
+        await message.answer("✅ Все уведомления о заказах доставлены")
+        return
+
+    lines = [f"⚠️ Недоставленные уведомления: {len(dead)}"]
+    for job in dead[-DEAD_LETTERS_SHOWN:]:
+        error = escape((job["last_error"] or "")[:200])
+        lines.append(f"• <code>{escape(job['order_id'])}</code>, попыток: {job['attempts']}\n  {error}")
+    lines.append("\nПовторить: /requeue &lt;order_id&gt;")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("requeue"), F.chat.id == ADMIN_GROUP_ID)
+async def requeue_dead_letter(message: types.Message, command: CommandObject):
+    """Retry delivery of a dead-lettered order notification."""
+    order_id = (command.args or "").strip()
+    if not order_id:
+        await message.answer("Использование: /requeue &lt;order_id&gt;")
+        return
+
+    if await order_outbox.requeue(order_id):
+        logger.info(f"Admin notification for order {order_id} requeued by {message.from_user.id}")
+        await message.answer(f"🔁 Уведомление о заказе <code>{escape(order_id)}</code> снова в очереди")
+    else:
+        await message.answer(f"Нет недоставленного уведомления для <code>{escape(order_id)}</code>")
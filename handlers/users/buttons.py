@@ -0,0 +1,58 @@
+"""
+Table-driven dispatch for reply keyboard buttons.
+
+Button texts are resolved to their locale key with one lookup in the
+localization reverse index and the key picks the handler from a table, so a
+button press costs a single filter call instead of walking a chain of text
+filters. Messages that are not a registered button fall through to the
+FSM-state routers included after this one.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union
+
+from aiogram import Router, types, F
+from aiogram.fsm.context import FSMContext
+
+from utils.localization import text_key
+
+ButtonHandler = Callable[[types.Message, FSMContext], Awaitable[Any]]
+
+
+class ButtonTable:
+    """Maps locale keys (and a few literal legacy texts) to message handlers."""
+
+    def __init__(self):
+        self._by_key: Dict[str, ButtonHandler] = {}
+        self._by_text: Dict[str, ButtonHandler] = {}
+
+    def handler(self, key: Optional[str] = None, aliases: Iterable[str] = ()):
+        """Register the decorated handler for locale key `key` and/or extra exact texts."""
+        def decorator(callback: ButtonHandler) -> ButtonHandler:
+            if key is not None:
+                self._by_key[key] = callback
+            for text in aliases:
+                self._by_text[text] = callback
+            return callback
+        return decorator
+
+    def resolve(self, text: str) -> Union[ButtonHandler, None]:
+        callback = self._by_text.get(text)
+        if callback is None:
+            callback = self._by_key.get(text_key(text))
+        return callback
+
+    def __call__(self, message: types.Message) -> Union[bool, Dict[str, Any]]:
+        """aiogram filter (sync, no I/O): passes the matched handler on as `button_handler`."""
+        callback = self.resolve(message.text)
+        return {"button_handler": callback} if callback is not None else False
+
+
+buttons = ButtonTable()
+
+router = Router()
+router.message.filter(F.chat.type == "private")
+
+
+@router.message(F.text, buttons)
+async def dispatch_button(message: types.Message, state: FSMContext, button_handler: ButtonHandler):
+    await button_handler(message, state)
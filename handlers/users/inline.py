@@ -15,7 +15,9 @@ from aiogram.fsm.context import FSMContext
 from states.registration import OrderState
 # Replaced inline keyboard import with show_catalog dynamically where needed
 from utils.api import api_client
+from utils.search import local_search
 from utils.localization import get_text, format_price
+from utils.media import send_product_photo
 from hashlib import md5
 import logging
 
@@ -44,14 +46,16 @@ async def inline_product_search(inline_query: types.InlineQuery):
         await inline_query.answer(results, cache_time=1)
         return
     
-    # Search products
-    try:
-        res = await api_client.search_products(query, limit=30)
-        products = res.get("items", [])
-        logger.info(f"Inline search for '{query}': got {len(products)} products")
-    except Exception as e:
-        logger.error(f"Inline search error: {e}")
-        products = []
+    # Search products locally; the backend is only used while the index is missing or stale
+    products = local_search(query, limit=30)
+    if products is None:
+        try:
+            res = await api_client.search_products(query, limit=30)
+            products = res.get("items", [])
+            logger.info(f"Inline search for '{query}': got {len(products)} products")
+        except Exception as e:
+            logger.error(f"Inline search error: {e}")
+            products = []
     
     if not products:
         results = [
@@ -164,12 +168,9 @@ async def handle_inline_product_selection(message: types.Message, state: FSMCont
     # Store product info
     await state.update_data(
         current_prod_id=product_id,
-        current_prod=product,
         cart=data.get("cart", [])
     )
     
-    images = product.get("images", [])
-    
     # Show product info and ask for quantity with localized text
     text = (
         f"<b>{name}</b>\n"
@@ -178,35 +179,8 @@ async def handle_inline_product_selection(message: types.Message, state: FSMCont
         f"{get_text('enter_amount', lang)}"
     )
     
-    # Send with image if available
-    image_sent = False
-    if images and len(images) > 0:
-        img_url = images[0]
-        try:
-            # Convert localhost URLs to internal Docker network URL
-            if "localhost" in img_url or "127.0.0.1" in img_url:
-                # Replace localhost:8002 with backend service URL
-                img_url = img_url.replace("http://localhost:8002", "http://app:8000")
-                img_url = img_url.replace("http://127.0.0.1:8002", "http://app:8000")
-            
-            # Download image and send as bytes
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.get(img_url) as response:
-                    if response.status == 200:
-                        image_data = await response.read()
-                        from aiogram.types import BufferedInputFile
-                        photo = BufferedInputFile(image_data, filename="product.jpg")
-                        await message.answer_photo(
-                            photo=photo,
-                            caption=text,
-                            parse_mode="HTML"
-                        )
-                        image_sent = True
-                    else:
-                        logger.warning(f"Failed to download image: HTTP {response.status}")
-        except Exception as e:
-            logger.warning(f"Failed to send product image: {e}")
+    # Send with image if available (cached file_id when possible)
+    image_sent = await send_product_photo(message, product, text)
     
     if not image_sent:
         await message.answer(text, parse_mode="HTML")
@@ -1,35 +1,32 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
-from utils.localization import get_text, LANG_MAP, format_price
+from aiogram.exceptions import TelegramBadRequest
+from utils.localization import get_text, LANG_MAP
 from keyboards.default.menu import get_language_keyboard, get_main_menu_keyboard
+from keyboards.inline.history import get_history_markup
+from handlers.users.buttons import buttons
 from utils.api import api_client
+from utils.history import get_history_page
 from states.registration import RegisterState
 
 router = Router()
 router.message.filter(F.chat.type == "private")
 
-@router.message(F.text == "📱 Kontaktni yuborish")
-@router.message(F.text == "📱 Отправить контакт") 
-@router.message(F.text == "📱 Share Contact")
-async def share_contact_handler(message: types.Message):
+@buttons.handler("contact_button")
+async def share_contact_handler(message: types.Message, state: FSMContext):
     # This is handled in start.py usually but if it's main menu... 
     # Wait, the main menu has "Contact Us" (Biz bilan aloqa)
     pass
 
-@router.message(lambda msg: msg.text in ["📞 Biz bilan aloqa", "📞 Связаться с нами", "📞 Contact Us"])
+@buttons.handler("btn_contact")
 async def contact_us(message: types.Message, state: FSMContext):
     data = await state.get_data()
     lang = data.get("lang", "ru")
     
     # Static contact info for now
-    contact_text = {
-        "uz": "Biz bilan bog'lanish:\nTel: +998 90 123 45 67\nTelegram: @admin",
-        "ru": "Наши контакты:\nТел: +998 90 123 45 67\nTelegram: @admin",
-        "en": "Contact us:\nPhone: +998 90 123 45 67\nTelegram: @admin"
-    }
-    await message.answer(contact_text.get(lang, contact_text["ru"]))
+    await message.answer(get_text("contact_info", lang))
 
-@router.message(lambda msg: msg.text in ["⚙️ Sozlamalar", "⚙️ Настройки", "⚙️ Settings"])
+@buttons.handler("btn_settings")
 async def settings_handler(message: types.Message, state: FSMContext):
     data = await state.get_data()
     lang = data.get("lang", "ru")
@@ -46,22 +43,17 @@ async def settings_handler(message: types.Message, state: FSMContext):
     from states.registration import MenuState
     await state.set_state(MenuState.language)
 
-@router.message(lambda msg: msg.text in ["✍️ Izoh qoldirish", "✍️ Оставить комментарий", "✍️ Leave a Comment"])
+@buttons.handler("btn_comment")
 async def comment_handler(message: types.Message, state: FSMContext):
     data = await state.get_data()
     lang = data.get("lang", "ru")
     
-    prompts = {
-        "uz": "Izohingizni yozib qoldiring:",
-        "ru": "Напишите ваш комментарий:",
-        "en": "Please write your comment:"
-    }
-    await message.answer(prompts.get(lang, prompts["ru"]))
+    await message.answer(get_text("comment_prompt", lang))
     # Set state to wait for comment
     from states.registration import MenuState
     await state.set_state(MenuState.comment)
 
-@router.message(lambda msg: msg.text in ["📜 Buyurtmalar tarixi", "📜 История заказов", "📜 Order History"])
+@buttons.handler("btn_history")
 async def history_handler(message: types.Message, state: FSMContext):
     data = await state.get_data()
     lang = data.get("lang", "ru")
@@ -75,46 +67,42 @@ async def history_handler(message: types.Message, state: FSMContext):
         return
 
     user_id = user_info.get("id")
-    res = await api_client.get_user_orders(user_id)
-    orders = res.get("items", [])
-    
-    if not orders:
-        no_orders_text = {
-            "uz": "Sizda hali buyurtmalar yo'q.",
-            "ru": "У вас пока нет заказов.",
-            "en": "You don't have any orders yet."
-        }
-        await message.answer(no_orders_text.get(lang, no_orders_text["ru"]))
-        return
+    msg_text, has_next = await get_history_page(user_id, 0, lang)
     
-    # Format order list
-    history_text = {
-        "uz": "Sizning buyurtmalaringiz tarixi:\n\n",
-        "ru": "Ваша история заказов:\n\n",
-        "en": "Your order history:\n\n"
-    }
-    msg_text = history_text.get(lang, history_text["ru"])
-    
-    status_map = {
-        "pending": "⏳",
-        "confirmed": "✅",
-        "declined": "❌"
-    }
-    
-    for order in orders[:10]: # Show last 10 orders
-        order_num = order.get("order_number", "???")
-        status = order.get("status", "pending")
-        date = order.get("created_at", "").split("T")[0]
-        total = order.get("total_amount", 0)
-        
-        status_icon = status_map.get(status, "❓")
-        msg_text += f"{status_icon} Order #{order_num} | {date} | {format_price(float(total))}\n"
+    if msg_text is None:
+        await message.answer(get_text("no_orders", lang))
+        return
+
+    await message.answer(msg_text, reply_markup=get_history_markup(0, has_next))
 
-    await message.answer(msg_text)
+
+@router.callback_query(F.data.startswith("history:"))
+async def history_page_callback(callback: types.CallbackQuery, state: FSMContext):
+    """Next/prev buttons under the order history message."""
+    data = await state.get_data()
+    lang = data.get("lang", "ru")
+    page = max(0, int(callback.data.split(":")[1]))
+    
+    user_info = await api_client.get_user(str(callback.from_user.id))
+    if not user_info:
+        await callback.answer()
+        return
+    
+    msg_text, has_next = await get_history_page(user_info.get("id"), page, lang)
+    if msg_text is None:
+        # History shrank since the buttons were drawn
+        await callback.answer()
+        return
+    
+    try:
+        await callback.message.edit_text(msg_text, reply_markup=get_history_markup(page, has_next))
+    except TelegramBadRequest:
+        pass  # Same page tapped twice: message is not modified
+    await callback.answer()
 
 
 # Handler for Order button
-@router.message(lambda msg: msg.text in ["📦 Buyurtma berish", "📦 Заказать", "📦 Order"])
+@buttons.handler("btn_order")
 async def order_handler(message: types.Message, state: FSMContext):
     """Start ordering - show root groups and search button"""
     data = await state.get_data()
@@ -123,8 +111,6 @@ async def order_handler(message: types.Message, state: FSMContext):
     await state.update_data(
         cart=data.get("cart", []),
         groups_stack=[],
-        current_items=[],
-        item_name_map={},
         current_parent_id=None,
         current_page=0
     )
@@ -164,10 +150,5 @@ async def process_comment(message: types.Message, state: FSMContext):
     # Send comment to backend or admin
     # api_client.send_feedback(...)
     
-    thanks = {
-        "uz": "Rahmat! Izohingiz qabul qilindi.",
-        "ru": "Спасибо! Ваш комментарий принят.",
-        "en": "Thank you! Your comment has been received."
-    }
-    await message.answer(thanks.get(lang, thanks["ru"]), reply_markup=get_main_menu_keyboard(lang))
+    await message.answer(get_text("comment_thanks", lang), reply_markup=get_main_menu_keyboard(lang))
     await state.set_state(MenuState.main)
@@ -1,15 +1,21 @@
+import asyncio
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest
 
 from states.registration import OrderState, MenuState
 from keyboards.default.catalog import (
-    get_catalog_keyboard,
+    get_cached_catalog_keyboard,
     get_cart_keyboard
 )
 from keyboards.default.menu import get_main_menu_keyboard
+from handlers.users.buttons import buttons
 from utils.api import api_client
-from utils.localization import get_text, format_price
+from utils.catalog import catalog_index
+from utils.localization import get_text, text_key, format_price
+from utils.media import send_product_photo
+from utils.outbox import order_outbox
+from utils.history import invalidate_order_history
 import logging
 
 router = Router()
@@ -47,26 +53,11 @@ async def show_catalog(message: types.Message, state: FSMContext, parent_id: str
     data = await state.get_data()
     lang = data.get("lang", "ru")
     
-    # Fetch groups and products
-    groups_res = await api_client.get_groups(parent_id=parent_id)
-    groups = groups_res.get("items", [])
-    
-    products = []
-    if parent_id:
-        products_res = await api_client.get_products(group_id=parent_id)
-        products = products_res.get("items", [])
-        
-    items = groups + products
+    items = await catalog_index.fetch_items(parent_id)
     
     if not items and parent_id is not None:
         return False
         
-    # Store mapping for easy lookup
-    item_name_map = {}
-    for item in items:
-        name = item.get(f"name_{lang}", item.get("name_ru", item.get("name", "Unknown")))
-        item_name_map[name.strip()] = item
-        
     # Store groups and navigation stack
     groups_stack = data.get("groups_stack", [])
     if parent_id:
@@ -75,9 +66,8 @@ async def show_catalog(message: types.Message, state: FSMContext, parent_id: str
     else:
         groups_stack = []
         
+    # Only ids and cursors go into FSM state; items are looked up in the shared catalog
     await state.update_data(
-        current_items=items,
-        item_name_map=item_name_map,
         current_parent_id=parent_id,
         groups_stack=groups_stack,
         current_page=page
@@ -88,32 +78,24 @@ async def show_catalog(message: types.Message, state: FSMContext, parent_id: str
     if extra_text:
         category_text = f"{extra_text}\n\n{category_text}"
     
+    # Index-backed pages are reused until the next catalog snapshot
+    cache_key = (parent_id, lang, is_root, page, catalog_index.version) if catalog_index.ready else None
     await message.answer(
         category_text,
-        reply_markup=get_catalog_keyboard(items, lang, is_root=is_root, page=page)
+        reply_markup=get_cached_catalog_keyboard(cache_key, items, lang, is_root=is_root, page=page)
     )
     
     # Show search button when at root level
     if is_root and page == 0:
         from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-        search_btn_texts = {
-            "uz": "🔍 Mahsulot qidirish",
-            "ru": "🔍 Поиск товаров", 
-            "en": "🔍 Search products"
-        }
-        search_hint_texts = {
-            "uz": "Yoki ushbu tugma bilan qidiring 👇",
-            "ru": "Или найдите товар с помощью кнопки 👇",
-            "en": "Or search using the button below 👇"
-        }
         search_keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(
-                text=search_btn_texts.get(lang, search_btn_texts["ru"]),
+                text=get_text("search_button", lang),
                 switch_inline_query_current_chat=""
             )]
         ])
         await message.answer(
-            search_hint_texts.get(lang, search_hint_texts["ru"]),
+            get_text("search_hint", lang),
             reply_markup=search_keyboard
         )
     
@@ -121,8 +103,35 @@ async def show_catalog(message: types.Message, state: FSMContext, parent_id: str
     return True
 
 
+def build_admin_notification(order_id: str, order_number: str, customer_name: str, customer_phone: str, cart: list, total_amount):
+    """Admin group message text and (text, callback_data) button rows for a new order."""
+    # Build order details message
+    items_text = "\n".join([
+        f"  • {item['product_name']} × {int(item['quantity'])} = {format_price(float(item['price']) * float(item['quantity']))}"
+        for item in cart
+    ])
+    
+    admin_message = (
+        f"🆕 <b>Новый заказ #{order_number}</b>\n\n"
+        f"👤 <b>Клиент:</b> {customer_name}\n"
+        f"📞 <b>Телефон:</b> {customer_phone}\n\n"
+        f"<b>Товары:</b>\n{items_text}\n\n"
+        f"💰 <b>Итого:</b> {format_price(float(total_amount))}\n\n"
+        f"🕐 Ожидает подтверждения"
+    )
+    
+    # Admin action buttons
+    admin_buttons = [
+        [
+            ("✅ Подтвердить", f"order_accept:{order_id}"),
+            ("❌ Отклонить", f"order_decline:{order_id}")
+        ]
+    ]
+    return admin_message, admin_buttons
+
+
 # --- Entry Point ---
-@router.message(F.text.in_(["🛍 Buyurtma berish", "🛍 Заказать", "🛍 Order"]))
+@buttons.handler(aliases=["🛍 Buyurtma berish", "🛍 Заказать", "🛍 Order"])
 async def start_order(message: types.Message, state: FSMContext):
     data = await state.get_data()
     lang = data.get("lang", "ru")
@@ -131,8 +140,6 @@ async def start_order(message: types.Message, state: FSMContext):
     await state.update_data(
         cart=data.get("cart", []),
         groups_stack=[],
-        current_groups=[],
-        current_products=[],
         current_parent_id=None
     )
     
@@ -149,27 +156,34 @@ async def start_order(message: types.Message, state: FSMContext):
 async def catalog_handler(message: types.Message, state: FSMContext):
     data = await state.get_data()
     lang = data.get("lang", "ru")
+    button = text_key(message.text)  # Locale key of a pressed button, in any language
     current_parent_id = data.get("current_parent_id")
     groups_stack = data.get("groups_stack", [])
     current_page = data.get("current_page", 0)
     
     # Check pagination
-    if message.text == get_text("prev", lang):
+    if button == "prev":
         await show_catalog(message, state, parent_id=current_parent_id, page=max(0, current_page - 1))
         return
-    if message.text == get_text("next", lang):
+    if button == "next":
         await show_catalog(message, state, parent_id=current_parent_id, page=current_page + 1)
         return
         
     # Check if back to menu (only for root level)
-    if message.text == get_text("back_to_menu", lang):
+    if button == "back_to_menu":
         await message.answer(get_text("menu_main", lang), reply_markup=get_main_menu_keyboard(lang))
         await state.set_state(MenuState.main)
         return
     
     # Check if back
-    if message.text == get_text("back", lang):
-        if groups_stack:
+    if button == "back":
+        if catalog_index.ready and catalog_index.get_group(current_parent_id):
+            # Parent pointer from the index, no need to replay the stack
+            parent_id = catalog_index.parent(current_parent_id)
+            groups_stack = groups_stack[:-1] if groups_stack else []
+            await state.update_data(groups_stack=groups_stack)
+            await show_catalog(message, state, parent_id=parent_id, page=0)
+        elif groups_stack:
             groups_stack.pop()  # Remove current level
             parent_id = groups_stack[-1] if groups_stack else None
             await state.update_data(groups_stack=groups_stack)
@@ -180,25 +194,15 @@ async def catalog_handler(message: types.Message, state: FSMContext):
         return
     
     # Check if view cart
-    if message.text == get_text("view_cart", lang):
+    if button == "view_cart":
         await show_cart(message, state)
         return
     
-    item_name_map = data.get("item_name_map", {})
     normalized_text = message.text.strip()
-    selected_item = item_name_map.get(normalized_text)
-    
-    # Fallback search
-    if not selected_item:
-        items = data.get("current_items", [])
-        for item in items:
-            item_name = item.get(f"name_{lang}", item.get("name_ru", item.get("name", "")))
-            if item_name.strip() == normalized_text:
-                selected_item = item
-                break
+    selected_item = await catalog_index.resolve(current_parent_id, lang, normalized_text)
                 
     if not selected_item:
-        logger.error(f"Item not found. Searched: '{normalized_text}', Available: {list(item_name_map.keys())}")
+        logger.error(f"Item not found. Searched: '{normalized_text}', Parent: {current_parent_id}")
         await message.answer("Item not found / Element topilmadi")
         return
         
@@ -213,42 +217,16 @@ async def catalog_handler(message: types.Message, state: FSMContext):
             return
     
         # Store product info for cart
-        await state.update_data(current_prod_id=prod_id, current_prod=product)
+        await state.update_data(current_prod_id=prod_id)
     
         name = product.get(f"name_{lang}", product.get("name_ru", product.get("name", "Unknown")))
         desc = product.get(f"description_{lang}", product.get("description_ru", product.get("description", "")))
         price = product.get("price", 0)
-        images = product.get("images", [])
         
         text = f"<b>{name}</b>\n\n{desc}\n\n{get_text('price', lang)}: {format_price(price)}\n\n{get_text('enter_amount', lang)}"
         
-        # Send image with caption if product has images
-        image_sent = False
-        if images and len(images) > 0:
-            img_url = images[0]
-            try:
-                # Convert localhost URLs to internal Docker network URL
-                if "localhost" in img_url or "127.0.0.1" in img_url:
-                    img_url = img_url.replace("http://localhost:8002", "http://app:8000")
-                    img_url = img_url.replace("http://127.0.0.1:8002", "http://app:8000")
-                
-                import aiohttp
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(img_url) as response:
-                        if response.status == 200:
-                            image_data = await response.read()
-                            from aiogram.types import BufferedInputFile
-                            photo = BufferedInputFile(image_data, filename="product.jpg")
-                            await message.answer_photo(
-                                photo=photo,
-                                caption=text,
-                                parse_mode="HTML"
-                            )
-                            image_sent = True
-                        else:
-                            logger.warning(f"Failed to download image: HTTP {response.status}")
-            except Exception as e:
-                logger.warning(f"Failed to send product image: {e}")
+        # Send image with caption if product has images (cached file_id when possible)
+        image_sent = await send_product_photo(message, product, text)
         
         if not image_sent:
             await message.answer(text, parse_mode="HTML")
@@ -257,6 +235,9 @@ async def catalog_handler(message: types.Message, state: FSMContext):
     else:
         # It's a group
         group_id = selected_item["id"]
+        if catalog_index.ready and catalog_index.is_empty(group_id):
+            await message.answer("No products found in this category / Bu kategoriyada mahsulotlar topilmadi")
+            return
         # Navigate deeper
         has_items = await show_catalog(message, state, parent_id=group_id, page=0)
         if not has_items:
@@ -267,16 +248,17 @@ async def catalog_handler(message: types.Message, state: FSMContext):
 async def process_amount(message: types.Message, state: FSMContext):
     data = await state.get_data()
     lang = data.get("lang", "ru")
+    button = text_key(message.text)
     
     # Handle Back button
-    if message.text == get_text("back", lang):
+    if button == "back":
         current_parent_id = data.get("current_parent_id")
         current_page = data.get("current_page", 0)
         await show_catalog(message, state, parent_id=current_parent_id, page=current_page)
         return
         
     # Handle View Cart button
-    if message.text == get_text("view_cart", lang):
+    if button == "view_cart":
         await show_cart(message, state)
         return
     
@@ -290,7 +272,13 @@ async def process_amount(message: types.Message, state: FSMContext):
 
     # Add to cart
     cart = data.get("cart", [])
-    product = data.get("current_prod")
+    prod_id = data.get("current_prod_id")
+    product = None
+    if prod_id:
+        product = catalog_index.get_product(prod_id) or await api_client.get_product(prod_id)
+    if not product:
+        await message.answer("Product details not available")
+        return
     product_name = product.get(f"name_{lang}", product.get("name_ru", product.get("name", "Unknown")))
     
     cart.append({
@@ -298,18 +286,14 @@ async def process_amount(message: types.Message, state: FSMContext):
         "iiko_product_id": product.get("iiko_id", ""),
         "quantity": amount,
         "price": float(product["price"]) if product.get("price") else 0,
-        "product_name": product_name
+        "product_name": product_name,
+        "organization_id": product.get("organization_id")
     })
     
     await state.update_data(cart=cart, groups_stack=[])
     
     # Confirmation + category selection in one message
-    confirmations = {
-        "uz": f"{product_name} ✅ savatga qo'shildi",
-        "ru": f"{product_name} ✅ добавлен в корзину",
-        "en": f"{product_name} ✅ added to cart"
-    }
-    confirmation = confirmations.get(lang, confirmations["ru"])
+    confirmation = get_text("product_added", lang).format(name=product_name)
     
     # Redirect back to root groups to continue shopping
     await state.update_data(groups_stack=[])
@@ -322,30 +306,31 @@ async def cart_action(message: types.Message, state: FSMContext):
     data = await state.get_data()
     cart = data.get("cart", [])
     lang = data.get("lang", "ru")
+    button = text_key(message.text)
     token = data.get("token")
     
     # Continue Shopping
-    if message.text == get_text("continue_shopping", lang):
+    if button == "continue_shopping":
         # Go back to root groups
         await state.update_data(groups_stack=[])
         await show_catalog(message, state, parent_id=None, page=0)
         return
     
     # Clear Cart
-    if message.text == get_text("clear_cart", lang):
+    if button == "clear_cart":
         await state.update_data(cart=[])
         await message.answer(get_text("cart_empty", lang), reply_markup=get_main_menu_keyboard(lang))
         await state.set_state(MenuState.main)
         return
     
     # Back to Menu
-    if message.text == get_text("back_to_menu", lang):
+    if button == "back_to_menu":
         await message.answer(get_text("menu_main", lang), reply_markup=get_main_menu_keyboard(lang))
         await state.set_state(MenuState.main)
         return
     
     # Checkout
-    if message.text == get_text("checkout", lang):
+    if button == "checkout":
         if not cart:
             await message.answer(get_text("cart_empty", lang))
             return
@@ -354,17 +339,20 @@ async def cart_action(message: types.Message, state: FSMContext):
             await message.answer("Session expired, please /start")
             return
 
-        # Get organization_id from first product
-        first_org_id = None
-        if cart:
-            p_id = cart[0]["product_id"]
-            p_details = await api_client.get_product(p_id)
+        telegram_id = str(message.from_user.id)
+        
+        # organization_id is recorded on the cart item when it is added;
+        # older carts without it fall back to a product lookup run alongside get_user
+        first_org_id = cart[0].get("organization_id")
+        if first_org_id is None:
+            user_info, p_details = await asyncio.gather(
+                api_client.get_user(telegram_id),
+                api_client.get_product(cart[0]["product_id"])
+            )
             if p_details:
                 first_org_id = p_details.get("organization_id")
-        
-        # Get user info
-        telegram_id = str(message.from_user.id)
-        user_info = await api_client.get_user(telegram_id)
+        else:
+            user_info = await api_client.get_user(telegram_id)
         
         # Get customer info with fallbacks
         customer_name = "Telegram User"
@@ -407,51 +395,20 @@ async def cart_action(message: types.Message, state: FSMContext):
             order_id = res.get("id")
             total_amount = res.get("total_amount", sum(float(item["price"]) * float(item["quantity"]) for item in cart))
             
-            # Tell user their order is pending
+            # Tell user their order is pending right away
             msg = get_text("order_created", lang).format(id=order_number)
             await message.answer(msg)
             await state.update_data(cart=[])
+            invalidate_order_history(user_id)
             
-            # Send order to admin group
-            from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-            
-            # Build order details message
-            items_text = "\n".join([
-                f"  • {item['product_name']} × {int(item['quantity'])} = {format_price(float(item['price']) * float(item['quantity']))}"
-                for item in cart
-            ])
-            
-            admin_message = (
-                f"🆕 <b>Новый заказ #{order_number}</b>\n\n"
-                f"👤 <b>Клиент:</b> {customer_name}\n"
-                f"📞 <b>Телефон:</b> {customer_phone}\n\n"
-                f"<b>Товары:</b>\n{items_text}\n\n"
-                f"💰 <b>Итого:</b> {format_price(float(total_amount))}\n\n"
-                f"🕐 Ожидает подтверждения"
+            # Admin notification is recorded durably and delivered by the outbox drainer
+            admin_message, admin_buttons = build_admin_notification(
+                order_id, order_number, customer_name, customer_phone, cart, total_amount
             )
-            
-            # Admin action buttons
-            admin_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"order_accept:{order_id}"),
-                    InlineKeyboardButton(text="❌ Отклонить", callback_data=f"order_decline:{order_id}")
-                ]
-            ])
-            
-            # Send to admin group
-            from data.config import ADMIN_GROUP_ID
-            from loader import bot
             try:
-                admin_msg = await bot.send_message(
-                    chat_id=ADMIN_GROUP_ID,
-                    text=admin_message,
-                    parse_mode="HTML",
-                    reply_markup=admin_keyboard
-                )
-                # Save message ID for later editing
-                await api_client.update_order_message_id(order_id, admin_msg.message_id)
+                await order_outbox.enqueue(order_id, admin_message, admin_buttons)
             except Exception as e:
-                logger.error(f"Failed to send order to admin group: {e}")
+                logger.error(f"Failed to queue admin notification for order {order_id}: {e}")
             
             await message.answer(get_text("menu_main", lang), reply_markup=get_main_menu_keyboard(lang))
             await state.set_state(MenuState.main)
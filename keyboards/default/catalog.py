@@ -1,5 +1,17 @@
+from functools import lru_cache
+from typing import Hashable, Optional
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
-from utils.localization import get_text
+from data.config import KEYBOARD_CACHE_SIZE
+from utils.cache import LRUCache
+from utils.catalog import catalog_index
+from utils.localization import add_reload_listener, get_text
+
+# Built catalog pages keyed by (parent_id, lang, is_root, page, catalog version);
+# shared instances, see the note in keyboards/default/menu.py.
+catalog_keyboard_cache = LRUCache(KEYBOARD_CACHE_SIZE, name="catalog_keyboards")
+catalog_index.add_listener(catalog_keyboard_cache.invalidate)
+add_reload_listener(catalog_keyboard_cache.invalidate)
 
 def get_catalog_keyboard(items: list, lang: str, is_root: bool = True, page: int = 0, items_per_page: int = 50):
     """Create reply keyboard for unified catalog with pagination"""
@@ -64,6 +76,17 @@ def get_catalog_keyboard(items: list, lang: str, is_root: bool = True, page: int
         resize_keyboard=True
     )
 
+def get_cached_catalog_keyboard(cache_key: Optional[Hashable], items: list, lang: str, is_root: bool = True, page: int = 0):
+    """get_catalog_keyboard memoized under cache_key; None bypasses the cache."""
+    if cache_key is None:
+        return get_catalog_keyboard(items, lang, is_root=is_root, page=page)
+    markup = catalog_keyboard_cache.get(cache_key)
+    if markup is None:
+        markup = get_catalog_keyboard(items, lang, is_root=is_root, page=page)
+        catalog_keyboard_cache.set(cache_key, markup, float("inf"))
+    return markup
+
+@lru_cache(maxsize=16)
 def get_cart_keyboard(lang: str):
     """Create reply keyboard for cart actions"""
     return ReplyKeyboardMarkup(
@@ -83,6 +106,7 @@ def get_subcategories_keyboard(subcategories: list, lang: str):
     """Alias for get_groups_keyboard for child groups"""
     return get_groups_keyboard(subcategories, lang, is_root=False)
 
+@lru_cache(maxsize=16)
 def get_product_detail_keyboard(lang: str):
     """Create reply keyboard for product details (deprecated)"""
     return ReplyKeyboardMarkup(
@@ -92,3 +116,7 @@ def get_product_detail_keyboard(lang: str):
         ],
         resize_keyboard=True
     )
+
+
+for _keyboard in (get_cart_keyboard, get_product_detail_keyboard):
+    add_reload_listener(_keyboard.cache_clear)
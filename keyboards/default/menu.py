@@ -1,6 +1,13 @@
+from functools import lru_cache
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
-from utils.localization import get_text
+from utils.localization import add_reload_listener, get_text
+
+# Keyboards here and in catalog.py are memoized, so one markup instance is
+# shared by every user who gets it. aiogram types are not frozen: never modify
+# a returned markup in place, build a new one (or model_copy(deep=True)) instead.
 
+@lru_cache(maxsize=1)
 def get_language_keyboard():
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -11,6 +18,7 @@ def get_language_keyboard():
         one_time_keyboard=True
     )
 
+@lru_cache(maxsize=16)
 def get_contact_keyboard(lang: str):
     text = get_text("contact_button", lang)
     return ReplyKeyboardMarkup(
@@ -21,6 +29,7 @@ def get_contact_keyboard(lang: str):
         one_time_keyboard=True
     )
 
+@lru_cache(maxsize=16)
 def get_main_menu_keyboard(lang: str):
     btn_order = KeyboardButton(text=get_text("btn_order", lang))
     btn_history = KeyboardButton(text=get_text("btn_history", lang))
@@ -36,3 +45,7 @@ def get_main_menu_keyboard(lang: str):
         ],
         resize_keyboard=True
     )
+
+
+for _keyboard in (get_language_keyboard, get_contact_keyboard, get_main_menu_keyboard):
+    add_reload_listener(_keyboard.cache_clear)
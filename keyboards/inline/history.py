@@ -0,0 +1,16 @@
+from typing import Optional
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+
+def get_history_markup(page: int, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """Prev/next buttons for an order history page; callback data is "history:<page>"."""
+    builder = InlineKeyboardBuilder()
+    if page > 0:
+        builder.button(text=f"⬅️ {page}", callback_data=f"history:{page - 1}")
+    if has_next:
+        builder.button(text=f"{page + 2} ➡️", callback_data=f"history:{page + 1}")
+    if page == 0 and not has_next:
+        return None
+    return builder.as_markup()
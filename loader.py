@@ -1,7 +1,54 @@
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.memory import MemoryStorage
 from data import config
+from utils.storage import SQLiteStorage
+from utils import json_codec
+from middlewares.outbound import SendScheduler
+from middlewares.metrics import TelegramMetricsMiddleware
 
-bot = Bot(token=config.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher()
+if config.FSM_STORAGE == "sqlite":
+    storage = SQLiteStorage(
+        config.FSM_DB_PATH,
+        flush_interval=config.FSM_FLUSH_INTERVAL,
+        durability=config.FSM_DURABILITY,
+        hot_max=config.FSM_HOT_MAX,
+        warmup_hours=config.FSM_WARMUP_HOURS,
+    )
+else:
+    storage = MemoryStorage()
+
+if config.TELEGRAM_API_URL:
+    session = AiohttpSession(
+        api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL),
+        json_loads=json_codec.loads,
+        json_dumps=json_codec.dumps,
+    )
+else:
+    session = AiohttpSession(json_loads=json_codec.loads, json_dumps=json_codec.dumps)
+
+# All outgoing messages go through the rate limiting send scheduler
+storage_chat_limits = {}
+if config.IMAGE_STORAGE_CHAT_ID is not None and config.PREWARM_UPLOAD_RATE > 0:
+    storage_chat_limits[config.IMAGE_STORAGE_CHAT_ID] = (config.PREWARM_UPLOAD_RATE, config.PREWARM_UPLOAD_BURST)
+send_scheduler = SendScheduler(
+    global_rate=config.SEND_GLOBAL_RATE,
+    chat_rate=config.SEND_CHAT_RATE,
+    chat_burst=config.SEND_CHAT_BURST,
+    group_rate=config.SEND_GROUP_RATE,
+    group_burst=config.SEND_GROUP_BURST,
+    retry_max=config.SEND_RETRY_MAX,
+    retry_after_max=config.SEND_RETRY_AFTER_MAX,
+    chat_limits=storage_chat_limits,
+    # Pre-warm uploads never go ahead of user replies
+    background_chats=[config.IMAGE_STORAGE_CHAT_ID] if config.IMAGE_STORAGE_CHAT_ID is not None else [],
+)
+session.middleware(send_scheduler)
+# Registered after the scheduler so timings exclude time spent queued for a send slot
+session.middleware(TelegramMetricsMiddleware())
+
+bot = Bot(token=config.BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+dp = Dispatcher(storage=storage)
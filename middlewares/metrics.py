@@ -0,0 +1,63 @@
+"""
+Timing middlewares feeding utils.metrics.
+
+HandlerMetricsMiddleware is an inner middleware, so it runs after filters
+and knows which handler matched; registered on the dispatcher's observers it
+covers the handlers of every included router. TelegramMetricsMiddleware is a
+bot session middleware timing each Bot API call.
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+
+from utils.metrics import HANDLER_DURATION, TELEGRAM_DURATION
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    def __init__(self, event: str):
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        # Button presses are labelled with the table handler, not the shared dispatcher
+        callback = data.get("button_handler") or data["handler"].callback
+        name = getattr(callback, "__name__", type(callback).__name__)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await handler(event, data)
+            status = "ok"
+            return result
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, event=self.event, handler=name, status=status)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await make_request(bot, method)
+            status = "ok"
+            return response
+        except TelegramRetryAfter:
+            status = "retry_after"
+            raise
+        finally:
+            TELEGRAM_DURATION.observe(time.perf_counter() - started, method=method.__api_method__, status=status)
@@ -0,0 +1,161 @@
+"""
+Concurrent update processing with per-chat ordering.
+
+Updates from different chats run in parallel on a bounded worker pool, while
+updates from the same chat run strictly one after another in arrival order,
+so rapid taps cannot race on FSM state (double checkout, lost cart items).
+
+Tickets are taken synchronously on entry, before the first await. aiogram
+starts one task per update in arrival order, so ticket order is arrival order.
+
+aiogram's FSMContextMiddleware is an outer middleware registered before this
+one, so it loads `raw_state` before the update has waited for its turn. The
+state is re-read once the turn is acquired, otherwise an update queued behind
+a state change would be routed with the state from before it.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Iterable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils.localization import text_key
+
+logger = logging.getLogger(__name__)
+
+# Buttons whose repeated press has no further effect
+MERGE_KEYS = frozenset({"checkout", "clear_cart"})
+
+
+class _Ticket:
+    __slots__ = ("turn", "text", "skipped")
+
+    def __init__(self, text: Optional[str]):
+        self.turn: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.text = text
+        self.skipped = False
+
+
+class OrderedDispatchMiddleware(BaseMiddleware):
+    """Outer update middleware: per-chat FIFO lanes over a global worker pool.
+
+    Flood policies per lane:
+    - drop: updates beyond `max_queue` waiting in a lane are discarded;
+    - merge: a press of an idempotent button (`merge_keys`, locale keys such
+      as checkout) right behind the same press still waiting is discarded as
+      a double tap. Other repeats ("Next", the same amount, the same item)
+      are usually intended and always queued;
+    - inline queries keep only the newest waiting query per user.
+
+    Chats in `unbounded_chats` (the admin group) are exempt from drop and merge:
+    every accept/decline tap there must be handled.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int = 10,
+        unbounded_chats: Iterable[int] = (),
+        merge_keys: Iterable[str] = MERGE_KEYS,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.merge_keys = frozenset(merge_keys)
+        self._unbounded = frozenset(("chat", chat_id) for chat_id in unbounded_chats)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lanes: Dict[Hashable, Deque[_Ticket]] = {}
+        self.dropped = 0
+        self.merged = 0
+        self.in_flight = 0
+
+    @staticmethod
+    def _lane_key(event: Update, data: Dict[str, Any]) -> Optional[Hashable]:
+        user = data.get("event_from_user")
+        if event.inline_query is not None:
+            # Read-only, so it gets its own lane and never waits behind a checkout
+            return ("inline", user.id) if user else None
+        chat = data.get("event_chat")
+        if chat is not None:
+            return ("chat", chat.id)
+        if user is not None:
+            return ("user", user.id)
+        return None
+
+    def _enqueue(self, key: Hashable, event: Update) -> Optional[_Ticket]:
+        lane = self._lanes.get(key)
+        text = event.message.text if event.message is not None else None
+        waiting = [t for t in list(lane)[1:] if not t.skipped] if lane else []
+
+        if key in self._unbounded:
+            pass  # No flood policy: queue everything
+        elif event.inline_query is not None:
+            for ticket in waiting:
+                ticket.skipped = True
+                self.merged += 1
+        elif text is not None and waiting and waiting[-1].text == text and text_key(text) in self.merge_keys:
+            self.merged += 1
+            return None
+        elif len(waiting) >= self.max_queue:
+            self.dropped += 1
+            logger.warning(f"Update queue full for {key}, dropping update {event.update_id}")
+            return None
+
+        ticket = _Ticket(text)
+        if not lane:
+            ticket.turn.set_result(None)
+            lane = self._lanes[key] = deque()
+        lane.append(ticket)
+        return ticket
+
+    def _release(self, key: Hashable, ticket: _Ticket):
+        lane = self._lanes[key]
+        if lane[0] is ticket:
+            lane.popleft()
+            if lane:
+                lane[0].turn.set_result(None)
+        else:
+            # Cancelled while still waiting for its turn
+            lane.remove(ticket)
+        if not lane:
+            del self._lanes[key]
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        key = self._lane_key(event, data) if isinstance(event, Update) else None
+        if key is None:
+            async with self._semaphore:
+                return await handler(event, data)
+
+        ticket = self._enqueue(key, event)
+        if ticket is None:
+            return None
+
+        try:
+            await ticket.turn
+            if ticket.skipped:
+                return None
+            state = data.get("state")
+            if state is not None:
+                data["raw_state"] = await state.get_state()
+            async with self._semaphore:
+                self.in_flight += 1
+                try:
+                    return await handler(event, data)
+                finally:
+                    self.in_flight -= 1
+        finally:
+            self._release(key, ticket)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
@@ -0,0 +1,229 @@
+"""
+Outbound Telegram send scheduler.
+
+Every Bot API call that creates a message passes through a per-chat token bucket and
+then a global one, so the bot stays under Telegram's limits (about 30
+messages per second overall, 1 per second per private chat and 20 per minute
+per group) instead of finding them through 429 errors. Calls waiting for a
+global slot are granted in priority order: private chats (user replies) go
+before group chats (admin notices) and background chats (image storage
+uploads). A chat can be given its own rate instead of the private or group
+default through `chat_limits`.
+
+A retry_after reply pauses the affected chat's bucket for the requested time
+and the call is resent.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_USER = 0
+PRIORITY_GROUP = 1
+PRIORITY_NAMES = {PRIORITY_USER: "user", PRIORITY_GROUP: "group"}
+
+# Bot API methods that create messages and count against the send limits.
+# Edits and chat actions bypass the buckets: they add no messages, and the
+# admin accept/decline edits must not queue behind order notifications.
+LIMITED_METHODS = frozenset({
+    "sendMessage", "sendPhoto", "sendDocument", "sendVideo", "sendAnimation",
+    "sendAudio", "sendVoice", "sendVideoNote", "sendMediaGroup", "sendPaidMedia",
+    "sendLocation", "sendVenue", "sendContact", "sendPoll", "sendDice",
+    "sendSticker", "sendInvoice", "sendGame",
+    "copyMessage", "copyMessages", "forwardMessage", "forwardMessages",
+})
+
+# Idle per-chat buckets are pruned once there are more than this many
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Token bucket that lets callers reserve a token ahead of time.
+
+    The balance may go negative; a negative balance is the queue of
+    reservations already handed out, which keeps waiters in FIFO order.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Take one token now, returning how long to wait before using it."""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Hold back everything for at least `seconds` (after a retry_after)."""
+        self._refill()
+        # The next reservation then waits exactly `seconds` (plus any queue ahead of it)
+        self.tokens = min(self.tokens, 0) - seconds * self.rate + 1
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """Bot session middleware rate limiting and prioritising outgoing messages."""
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        group_burst: float = 3.0,
+        retry_max: int = 3,
+        retry_after_max: float = 60.0,
+        chat_limits: Optional[Dict[Any, Tuple[float, float]]] = None,
+        background_chats: Iterable[Any] = (),
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.retry_max = retry_max
+        self.retry_after_max = retry_after_max
+        self.chat_limits = dict(chat_limits or {})
+        self.background_chats = frozenset(background_chats)
+
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.retry_after_hits = 0
+        self.retry_after_seconds = 0.0
+        self.waiting_chat = 0
+        self.max_queue_depth = 0
+
+    @staticmethod
+    def _is_group(chat_id: Any) -> bool:
+        # Group, supergroup and channel ids are negative; "@channel" usernames too
+        if isinstance(chat_id, str):
+            return chat_id.startswith("@") or chat_id.startswith("-")
+        return chat_id < 0
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                for key in [k for k, b in self._chats.items() if b.idle]:
+                    del self._chats[key]
+            if chat_id in self.chat_limits:
+                bucket = TokenBucket(*self.chat_limits[chat_id])
+            elif self._is_group(chat_id):
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    # --- Global slot, granted in priority order ---
+    async def _pump(self):
+        while self._queue:
+            delay = self.global_bucket.wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, waiter = heapq.heappop(self._queue)
+            if waiter.done():  # Caller was cancelled while queued
+                continue
+            self.global_bucket.reserve()
+            waiter.set_result(None)
+
+    async def _global_slot(self, priority: int):
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            waiter.cancel()
+            raise
+
+    async def _acquire(self, chat_id: Any):
+        delay = self._chat_bucket(chat_id).reserve()
+        if delay > 0:
+            self.waiting_chat += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.waiting_chat -= 1
+        if chat_id in self.background_chats or self._is_group(chat_id):
+            await self._global_slot(PRIORITY_GROUP)
+        else:
+            await self._global_slot(PRIORITY_USER)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or method.__api_method__ not in LIMITED_METHODS:
+            return await make_request(bot, method)
+
+        attempt = 0
+        while True:
+            await self._acquire(chat_id)
+            try:
+                response = await make_request(bot, method)
+                self.sent += 1
+                return response
+            except TelegramRetryAfter as e:
+                self.retry_after_hits += 1
+                self.retry_after_seconds += e.retry_after
+                if attempt >= self.retry_max or e.retry_after > self.retry_after_max:
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"Flood wait {e.retry_after}s on {method.__api_method__} to {chat_id}, "
+                    f"resending (attempt {attempt}/{self.retry_max})"
+                )
+                self._chat_bucket(chat_id).pause(e.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, waiter in self._queue:
+            if not waiter.done():
+                queued[PRIORITY_NAMES[priority]] += 1
+        return {
+            "queued": queued,
+            "waiting_chat": self.waiting_chat,
+            "max_queue_depth": self.max_queue_depth,
+            "sent": self.sent,
+            "retry_after_hits": self.retry_after_hits,
+            "retry_after_seconds": self.retry_after_seconds,
+            "chats_tracked": len(self._chats),
+        }
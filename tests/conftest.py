@@ -0,0 +1,5 @@
+import os
+
+# data.config reads these at import time
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:test")
+os.environ.setdefault("FSM_STORAGE", "memory")
@@ -0,0 +1,25 @@
+import pytest
+
+import app
+from data import config
+
+
+@pytest.mark.parametrize(
+    "secret, base_url, error",
+    [
+        ("", "https://bot.example.com", "WEBHOOK_SECRET"),
+        ("not a valid token!", "https://bot.example.com", "WEBHOOK_SECRET"),
+        ("s3cret_token", "", "WEBHOOK_BASE_URL"),
+    ],
+)
+def test_webhook_mode_refuses_incomplete_config(monkeypatch, secret, base_url, error):
+    monkeypatch.setattr(config, "WEBHOOK_SECRET", secret)
+    monkeypatch.setattr(config, "WEBHOOK_BASE_URL", base_url)
+    with pytest.raises(RuntimeError, match=error):
+        app.check_webhook_config()
+
+
+def test_webhook_config_with_secret_and_url_passes(monkeypatch):
+    monkeypatch.setattr(config, "WEBHOOK_SECRET", "s3cret_token")
+    monkeypatch.setattr(config, "WEBHOOK_BASE_URL", "https://bot.example.com")
+    app.check_webhook_config()
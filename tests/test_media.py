@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+from utils.media import FileIdCache
+
+
+def test_file_ids_are_written_behind_in_batches(tmp_path):
+    path = str(tmp_path / "file_ids.json")
+
+    async def scenario():
+        cache = FileIdCache(path, flush_interval=0.05)
+        writes = []
+        write = cache._write
+
+        def counting_write(snapshot):
+            writes.append(len(snapshot))
+            write(snapshot)
+
+        cache._write = counting_write
+        cache.start()
+        for i in range(100):
+            cache.set(str(i), f"http://img/{i}.jpg", f"file-{i}")
+        assert writes == []  # Nothing written on the send path
+
+        await asyncio.sleep(0.12)
+        assert writes == [100]  # One write for the whole burst, none while idle
+
+        cache.invalidate("0")
+        await cache.stop()
+        assert writes == [100, 99]
+
+    asyncio.run(scenario())
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert len(saved) == 99 and saved["1"] == {"url": "http://img/1.jpg", "file_id": "file-1"}
+    assert FileIdCache(path).get("1", "http://img/1.jpg") == "file-1"
@@ -0,0 +1,162 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from middlewares.ordering import OrderedDispatchMiddleware
+from utils.localization import get_text
+
+USER_ID = 42
+ADMIN_GROUP_ID = -1001
+
+
+class Flow(StatesGroup):
+    amount = State()
+
+
+def message_update(update_id: int, text: str) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=USER_ID, type="private"),
+            from_user=User(id=USER_ID, is_bot=False, first_name="Test"),
+            text=text,
+        ),
+    )
+
+
+def admin_callback_update(update_id: int) -> Update:
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(
+            id=str(update_id),
+            from_user=User(id=USER_ID, is_bot=False, first_name="Admin"),
+            chat_instance="admins",
+            data=f"accept:{update_id}",
+            message=Message(
+                message_id=1,
+                date=datetime.now(),
+                chat=Chat(id=ADMIN_GROUP_ID, type="supergroup"),
+                text="New order",
+            ),
+        ),
+    )
+
+
+async def feed_concurrently(dp: Dispatcher, bot: Bot, updates):
+    # Polling starts one task per update in arrival order
+    tasks = [asyncio.create_task(dp.feed_update(bot, update)) for update in updates]
+    await asyncio.gather(*tasks)
+
+
+def test_queued_update_sees_state_set_by_previous_update():
+    seen = []
+
+    async def pick_product(message: Message, state: FSMContext):
+        await asyncio.sleep(0.01)
+        await state.set_state(Flow.amount)
+        seen.append("product")
+
+    async def enter_amount(message: Message):
+        seen.append(f"amount:{message.text}")
+
+    async def fallback(message: Message, raw_state):
+        seen.append(f"fallback:{message.text}:{raw_state}")
+
+    async def scenario():
+        bot = Bot("123456:test")
+        dp = Dispatcher()
+        dp.update.outer_middleware(OrderedDispatchMiddleware(workers=10))
+        dp.message.register(pick_product, F.text == "Radiator")
+        dp.message.register(enter_amount, Flow.amount)
+        dp.message.register(fallback)
+        try:
+            await feed_concurrently(dp, bot, [message_update(1, "Radiator"), message_update(2, "3")])
+        finally:
+            await bot.session.close()
+
+    asyncio.run(scenario())
+    assert seen == ["product", "amount:3"]
+
+
+def _callback_scenario(unbounded_chats):
+    handled = []
+    release = asyncio.Event()
+
+    async def on_callback(callback: CallbackQuery):
+        await release.wait()
+        handled.append(callback.data)
+
+    async def scenario():
+        bot = Bot("123456:test")
+        dp = Dispatcher()
+        ordering = OrderedDispatchMiddleware(workers=10, max_queue=2, unbounded_chats=unbounded_chats)
+        dp.update.outer_middleware(ordering)
+        dp.callback_query.register(on_callback)
+        try:
+            feeding = asyncio.create_task(
+                feed_concurrently(dp, bot, [admin_callback_update(i) for i in range(1, 8)])
+            )
+            await asyncio.sleep(0.01)
+            release.set()
+            await feeding
+        finally:
+            await bot.session.close()
+        return ordering
+
+    ordering = asyncio.run(scenario())
+    return handled, ordering
+
+
+def test_admin_group_callbacks_are_never_dropped():
+    handled, ordering = _callback_scenario(unbounded_chats=(ADMIN_GROUP_ID,))
+    assert handled == [f"accept:{i}" for i in range(1, 8)]
+    assert ordering.dropped == 0
+
+
+def test_other_chats_keep_drop_policy():
+    handled, ordering = _callback_scenario(unbounded_chats=())
+    # One running plus max_queue waiting; the rest are dropped
+    assert handled == ["accept:1", "accept:2", "accept:3"]
+    assert ordering.dropped == 4
+
+
+def _message_scenario(texts):
+    handled = []
+
+    async def on_message(message: Message):
+        await asyncio.sleep(0.01)
+        handled.append(message.text)
+
+    async def scenario():
+        bot = Bot("123456:test")
+        dp = Dispatcher()
+        ordering = OrderedDispatchMiddleware(workers=10)
+        dp.update.outer_middleware(ordering)
+        dp.message.register(on_message)
+        try:
+            await feed_concurrently(dp, bot, [message_update(i, text) for i, text in enumerate(texts, 1)])
+        finally:
+            await bot.session.close()
+        return ordering
+
+    return handled, asyncio.run(scenario())
+
+
+def test_repeated_presses_are_handled():
+    next_text = get_text("next", "ru")
+    handled, ordering = _message_scenario(["Radiator", next_text, next_text, next_text, "3", "3"])
+    assert handled == ["Radiator", next_text, next_text, next_text, "3", "3"]
+    assert ordering.merged == 0
+
+
+def test_double_checkout_is_merged():
+    checkout = get_text("checkout", "ru")
+    handled, ordering = _message_scenario(["Radiator", checkout, checkout])
+    assert handled == ["Radiator", checkout]
+    assert ordering.merged == 1
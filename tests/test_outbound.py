@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, SendChatAction, SendMessage
+
+from middlewares.outbound import SendScheduler, TokenBucket
+
+
+def test_user_replies_are_sent_before_group_messages():
+    scheduler = SendScheduler(global_rate=30)
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method.chat_id)
+
+    async def scenario():
+        group_calls = [scheduler(make_request, None, SendMessage(chat_id=-100 - i, text="order")) for i in range(5)]
+        user_calls = [scheduler(make_request, None, SendMessage(chat_id=i + 1, text="hi")) for i in range(5)]
+        await asyncio.gather(*group_calls, *user_calls)
+
+    asyncio.run(scenario())
+    assert sent[:5] == [1, 2, 3, 4, 5]
+    assert all(chat_id < 0 for chat_id in sent[5:])
+    assert scheduler.stats()["sent"] == 10
+
+
+def test_per_chat_rate_is_enforced():
+    scheduler = SendScheduler(global_rate=100, chat_rate=20, chat_burst=1)
+    sent_at = []
+
+    async def make_request(bot, method):
+        sent_at.append(time.monotonic())
+
+    async def scenario():
+        await asyncio.gather(*(scheduler(make_request, None, SendMessage(chat_id=7, text=str(i))) for i in range(4)))
+
+    asyncio.run(scenario())
+    # One immediately, then one every 50 ms
+    assert sent_at[-1] - sent_at[0] >= 0.14
+
+
+def test_retry_after_pauses_the_chat_and_resends():
+    scheduler = SendScheduler(global_rate=100, retry_max=2)
+    attempts = []
+
+    async def make_request(bot, method):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise TelegramRetryAfter(method=method, message="Flood control exceeded", retry_after=1)
+        return "ok"
+
+    result = asyncio.run(scheduler(make_request, None, SendMessage(chat_id=7, text="hi")))
+    assert result == "ok"
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.95
+    assert scheduler.retry_after_hits == 1
+
+
+def test_token_bucket_reservations_queue_in_order():
+    bucket = TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays[:2] == [0.0, 0.0]
+    assert 0.09 <= delays[2] <= 0.11
+    assert 0.19 <= delays[3] <= 0.21
+
+
+def test_edits_and_chat_actions_bypass_the_buckets():
+    scheduler = SendScheduler(global_rate=100, group_rate=1 / 60, group_burst=1)
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method.__api_method__)
+
+    async def scenario():
+        # Uses up the admin group's only token
+        await scheduler(make_request, None, SendMessage(chat_id=-100, text="New order"))
+        await asyncio.wait_for(
+            asyncio.gather(
+                scheduler(make_request, None, EditMessageText(chat_id=-100, message_id=1, text="Accepted")),
+                scheduler(make_request, None, SendChatAction(chat_id=-100, action="typing")),
+            ),
+            timeout=0.5,
+        )
+
+    asyncio.run(scenario())
+    assert sent == ["sendMessage", "editMessageText", "sendChatAction"]
+    assert scheduler.stats()["sent"] == 1
+
+
+def test_storage_chat_gets_its_own_rate_and_low_priority():
+    storage_chat = -1001
+    scheduler = SendScheduler(
+        global_rate=100, group_rate=1 / 60, group_burst=1,
+        chat_limits={storage_chat: (20, 1)}, background_chats=[storage_chat, 5],
+    )
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method.chat_id)
+
+    async def scenario():
+        # Far faster than the 20/min group default
+        uploads = [scheduler(make_request, None, SendMessage(chat_id=storage_chat, text=str(i))) for i in range(4)]
+        await asyncio.wait_for(asyncio.gather(*uploads), timeout=1)
+
+    asyncio.run(scenario())
+    assert sent == [storage_chat] * 4
+
+    sent.clear()
+
+    async def priorities():
+        background = [scheduler(make_request, None, SendMessage(chat_id=5, text="upload"))]
+        user = [scheduler(make_request, None, SendMessage(chat_id=6, text="hi"))]
+        await asyncio.gather(*background, *user)
+
+    asyncio.run(priorities())
+    assert sent == [6, 5]
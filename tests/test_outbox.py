@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import outbox
+from utils.outbox import DEAD, PENDING, SENT, NotificationOutbox
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeBot:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.fail:
+            raise ConnectionError("network down")
+        self.sent.append(text)
+        return SimpleNamespace(message_id=100 + len(self.sent))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(outbox.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Records update_order_message_id calls; set `fail` to make them error."""
+    backend = SimpleNamespace(calls=[], fail=False)
+
+    async def update_order_message_id(order_id, message_id):
+        backend.calls.append((order_id, message_id))
+        return {"error": "HTTP 503"} if backend.fail else {"ok": True}
+
+    monkeypatch.setattr(outbox.api_client, "update_order_message_id", update_order_message_id)
+    return backend
+
+
+def make_outbox(tmp_path, bot, **kwargs) -> NotificationOutbox:
+    box = NotificationOutbox(str(tmp_path / "outbox.sqlite3"), chat_id=-100, **kwargs)
+    box.bot = bot
+    return box
+
+
+def test_repeated_order_id_is_enqueued_once(tmp_path, clock, backend):
+    bot = FakeBot()
+    box = make_outbox(tmp_path, bot)
+
+    async def scenario():
+        assert await box.enqueue("o1", "first", [[("Accept", "order_accept:o1")]])
+        assert not await box.enqueue("o1", "second")
+        await box.drain_once()
+        assert not await box.enqueue("o1", "third")
+        await box.drain_once()
+        return await box.counts()
+
+    assert asyncio.run(scenario()) == {PENDING: 0, SENT: 1, DEAD: 0}
+    assert bot.sent == ["first"]
+
+
+def test_failures_back_off_then_dead_letter_and_requeue(tmp_path, clock, backend):
+    bot = FakeBot(fail=True)
+    box = make_outbox(tmp_path, bot, max_attempts=3, retry_base=5, retry_cap=60)
+
+    async def scenario():
+        await box.enqueue("o1", "order")
+        assert await box.drain_once() == 1
+        # Not due again before retry_base, and due once the capped backoff has passed
+        clock.now += 4
+        assert await box.drain_once() == 0
+        clock.now += 60
+        assert await box.drain_once() == 1
+        clock.now += 60
+        assert await box.drain_once() == 1
+        clock.now += 3600
+        assert await box.drain_once() == 0  # Dead letters are not retried
+
+        dead = await box.dead_letters()
+        assert [(job["order_id"], job["attempts"]) for job in dead] == [("o1", 3)]
+        assert "network down" in dead[0]["last_error"]
+
+        bot.fail = False
+        assert await box.requeue("o1")
+        assert not await box.requeue("o1")  # No longer dead
+        assert await box.drain_once() == 1
+        return await box.counts()
+
+    assert asyncio.run(scenario()) == {PENDING: 0, SENT: 1, DEAD: 0}
+    assert box.retried == 2 and box.dead_lettered == 1 and box.delivered == 1
+    assert bot.sent == ["order"]
+
+
+def test_recorded_message_is_not_posted_again(tmp_path, clock, backend):
+    bot = FakeBot()
+    box = make_outbox(tmp_path, bot, retry_base=5, retry_cap=5)
+    backend.fail = True
+
+    async def scenario():
+        await box.enqueue("o1", "order")
+        await box.drain_once()
+        assert (await box.counts())[PENDING] == 1
+
+        # Only the backend step is retried, with the recorded message_id
+        backend.fail = False
+        clock.now += 5
+        await box.drain_once()
+        return await box.counts()
+
+    assert asyncio.run(scenario()) == {PENDING: 0, SENT: 1, DEAD: 0}
+    assert bot.sent == ["order"]
+    assert backend.calls == [("o1", 101), ("o1", 101)]
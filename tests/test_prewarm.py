@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from utils.prewarm import prepare_photo
+
+
+def encode(img, fmt: str) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format=fmt)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("mode, transparent", [("RGBA", (0, 0, 0, 0)), ("LA", (0, 0))])
+def test_transparent_png_gets_white_background(mode, transparent):
+    img = Image.new(mode, (40, 40), transparent)
+    result = Image.open(io.BytesIO(prepare_photo(encode(img, "PNG"))))
+    assert result.format == "JPEG"
+    assert all(channel > 245 for channel in result.convert("RGB").getpixel((20, 20)))
+
+
+def test_palette_png_with_transparency_gets_white_background():
+    img = Image.new("P", (40, 40), 0)
+    img.putpalette([0, 0, 0] * 256)
+    data = encode(img, "PNG")
+    img = Image.open(io.BytesIO(data))
+    img.info["transparency"] = 0
+    result = Image.open(io.BytesIO(prepare_photo(encode(img, "PNG"))))
+    assert all(channel > 245 for channel in result.convert("RGB").getpixel((20, 20)))
+
+
+def test_small_jpeg_is_passed_through():
+    data = encode(Image.new("RGB", (40, 40), (200, 10, 10)), "JPEG")
+    assert prepare_photo(data) == data
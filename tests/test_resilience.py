@@ -0,0 +1,127 @@
+import pytest
+
+from utils import resilience
+from utils.resilience import CircuitBreaker, RetryBudget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def call(breaker: CircuitBreaker, success: bool):
+    permit = breaker.allow()
+    assert permit is not None
+    breaker.record(permit, success)
+
+
+def trip(breaker: CircuitBreaker):
+    while breaker.state != CircuitBreaker.OPEN:
+        call(breaker, False)
+
+
+def test_breaker_opens_on_error_rate_and_fails_fast(clock):
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=4, window=10, open_seconds=5)
+    for success in (True, False, True):
+        call(breaker, success)
+    assert breaker.state == CircuitBreaker.CLOSED  # Below min_requests
+
+    call(breaker, False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() is None
+    assert breaker.rejected == 1
+
+
+def test_breaker_lets_one_probe_through_when_half_open(clock):
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=2, window=10, open_seconds=5)
+    transitions = []
+    breaker.add_listener(lambda old, new: transitions.append(new))
+    trip(breaker)
+
+    clock.now += 5
+    probe = breaker.allow()
+    assert probe is not None and probe.probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() is None  # Only one probe at a time
+
+    breaker.record(probe, False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 5
+    call(breaker, True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert transitions == ["open", "half_open", "open", "half_open", "closed"]
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=1, window=10, open_seconds=5)
+    trip(breaker)
+    clock.now += 5
+    probe = breaker.allow()
+    breaker.abandon(probe)  # e.g. the probing request was cancelled
+    assert breaker.allow() is not None
+
+
+def test_only_the_probe_decides_the_half_open_state(clock):
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=2, window=10, open_seconds=5)
+    slow = breaker.allow()  # Started while closed, finishes much later
+    trip(breaker)
+    clock.now += 5
+    probe = breaker.allow()
+
+    # A cancelled older call must not free the probe slot
+    breaker.abandon(slow)
+    assert breaker.allow() is None
+
+    # Nor may its late outcome close or re-open the breaker
+    breaker.record(slow, True)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(slow, False)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(probe, True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stale_failures_do_not_reopen_a_closed_breaker(clock):
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=1, window=10, open_seconds=5)
+    stale = [breaker.allow() for _ in range(3)]
+    trip(breaker)
+    clock.now += 5
+    call(breaker, True)  # Probe succeeds
+    for permit in stale:
+        breaker.record(permit, False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.error_rate == 0.0
+
+
+def test_old_errors_leave_the_window(clock):
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=3, window=10, open_seconds=5)
+    for _ in range(2):
+        call(breaker, False)
+    clock.now += 11
+    for _ in range(3):
+        call(breaker, True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.error_rate == 0.0
+
+
+def test_retry_budget_limits_retries_to_a_share_of_traffic(clock):
+    budget = RetryBudget(ratio=0.1, min_per_second=0.0, cap=100)
+    budget.balance = 0.0
+    for _ in range(20):
+        budget.deposit()
+    assert budget.try_withdraw()
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+    assert budget.exhausted == 1
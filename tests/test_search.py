@@ -0,0 +1,68 @@
+import asyncio
+
+from utils.catalog import catalog_index
+from utils.search import SearchIndex
+
+PRODUCTS = {
+    "1": {"id": "1", "name_ru": "Радиатор алюминиевый 500", "name_en": "Aluminium radiator 500"},
+    "2": {"id": "2", "name_ru": "Радиатор биметаллический 350", "name_en": "Bimetal radiator 350"},
+    "3": {"id": "3", "name_uz": "Sharli kran 20", "name_en": "Ball valve 20"},
+    "4": {"id": "4", "name_ru": "Котёл газовый 24", "name_en": "Gas boiler 24"},
+}
+
+
+def ids(results):
+    return [product["id"] for product in results]
+
+
+def test_search_matches_across_scripts_prefixes_and_typos():
+    index = SearchIndex()
+    index.build(PRODUCTS)
+    assert ids(index.search("радиатор 500"))[0] == "1"
+    assert ids(index.search("radiator 35"))[0] == "2"
+    assert set(ids(index.search("radiatr"))) == {"1", "2"}
+    assert ids(index.search("kran")) == ["3"]
+
+
+def test_yo_and_ye_are_interchangeable():
+    index = SearchIndex()
+    index.build(PRODUCTS)
+    assert ids(index.search("котел")) == ["4"]
+    assert ids(index.search("котёл")) == ["4"]
+    assert ids(index.search("kotel")) == ["4"]
+
+
+def test_multi_word_queries_rank_full_matches_first(monkeypatch):
+    import utils.search
+
+    # A cap far below the number of radiators must not hide the full match
+    monkeypatch.setattr(utils.search, "MAX_CANDIDATES_PER_TOKEN", 5)
+    products = {
+        str(i): {"id": str(i), "name_en": f"Steel radiator {i}"} for i in range(100)
+    }
+    products["x"] = {"id": "x", "name_en": "Copper radiator Rifar"}
+    index = SearchIndex()
+    index.build(products)
+    assert ids(index.search("radiator rifar", limit=3))[0] == "x"
+
+
+def test_rebuild_runs_in_background_and_skips_unchanged_catalog(monkeypatch):
+    async def scenario():
+        index = SearchIndex()
+        monkeypatch.setattr(catalog_index, "products_by_id", dict(PRODUCTS))
+        monkeypatch.setattr(catalog_index, "version", 1)
+        index.rebuild()
+        assert index.version == 0  # Not built inline on the event loop
+        await index._rebuild_task
+        assert index.version == 1
+        tables = index.tables
+
+        # Refresh with equal products: version follows the catalog, tables are kept
+        monkeypatch.setattr(catalog_index, "products_by_id", {k: dict(v) for k, v in PRODUCTS.items()})
+        monkeypatch.setattr(catalog_index, "version", 2)
+        index.rebuild()
+        await index._rebuild_task
+        assert index.version == 2
+        assert index.tables is tables
+
+    asyncio.run(scenario())
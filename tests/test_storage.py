@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from decimal import Decimal
+
+from aiogram.fsm.storage.base import StorageKey
+
+from utils.storage import SQLiteStorage
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def test_unserializable_record_does_not_lose_the_batch(tmp_path):
+    path = str(tmp_path / "fsm.sqlite3")
+
+    async def scenario():
+        storage = SQLiteStorage(path, flush_interval=0.01)
+        await storage.start()
+        await storage.set_data(key(1), {"price": Decimal("4.50")})
+        await storage.set_data(key(2), {"cart": [1, 2]})
+        await asyncio.sleep(0.05)
+        # The flush loop must survive the bad record and keep writing
+        await storage.set_state(key(3), "OrderState:amount")
+        await asyncio.sleep(0.05)
+        assert storage._flush_task is not None and not storage._flush_task.done()
+        # Logged once and dropped, not retried on every flush
+        assert storage.pending_writes == 0
+
+        # Replacing the bad data persists the key again
+        await storage.set_data(key(4), {"price": Decimal("1")})
+        await asyncio.sleep(0.05)
+        await storage.set_data(key(4), {"price": "1"})
+        await storage.close()
+
+        reopened = SQLiteStorage(path)
+        try:
+            assert await reopened.get_data(key(2)) == {"cart": [1, 2]}
+            assert await reopened.get_state(key(3)) == "OrderState:amount"
+            assert await reopened.get_data(key(1)) == {}
+            assert await reopened.get_data(key(4)) == {"price": "1"}
+        finally:
+            await reopened.close()
+
+    asyncio.run(scenario())
+
+
+def test_in_flight_records_are_not_evicted(tmp_path):
+    path = str(tmp_path / "fsm.sqlite3")
+
+    async def scenario():
+        storage = SQLiteStorage(path, hot_max=1)
+        await storage.set_data(key(1), {"cart": ["old"]})
+        await storage.flush()
+
+        await storage.set_data(key(1), {"cart": ["new"]})
+        release = threading.Event()
+        write_batch = storage._write_batch
+
+        def slow_write_batch(*args):
+            release.wait()
+            write_batch(*args)
+
+        storage._write_batch = slow_write_batch
+        flushing = asyncio.create_task(storage.flush())
+        await asyncio.sleep(0.01)
+
+        # Loading a cold key pushes the hot set over hot_max
+        await storage.get_state(key(2))
+        assert await storage.get_data(key(1)) == {"cart": ["new"]}
+
+        release.set()
+        await flushing
+        await storage.close()
+
+    asyncio.run(scenario())
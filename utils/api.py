@@ -1,23 +1,135 @@
 import aiohttp
+import asyncio
+import base64
+import json
 import logging
-from typing import Optional, Dict, Any, List
-from data.config import API_URL, ADMIN_USERNAME, ADMIN_PASSWORD
+import re
+import time
+from typing import Optional, Dict, Any, List, Tuple
+from data.config import (
+    API_URL, ADMIN_USERNAME, ADMIN_PASSWORD,
+    CATALOG_CACHE_TTL, CATALOG_CACHE_STALE_TTL, TOKEN_REFRESH_MARGIN,
+    USER_TOKEN_CACHE_SIZE, USER_TOKEN_DEFAULT_TTL, PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL,
+    BACKEND_TIMEOUT, BACKEND_TIMEOUT_OVERRIDES, RETRY_MAX, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP,
+    RETRY_BUDGET_RATIO, RETRY_MIN_PER_SECOND, BREAKER_ERROR_THRESHOLD, BREAKER_MIN_REQUESTS,
+    BREAKER_WINDOW, BREAKER_OPEN_SECONDS, BACKEND_POOL_LIMIT, BACKEND_POOL_LIMIT_PER_HOST,
+    BACKEND_KEEPALIVE_TIMEOUT, BACKEND_DNS_TTL, BACKEND_CONNECT_TIMEOUT
+)
 from contextvars import ContextVar
+from utils.cache import TTLCache, LRUCache
+from utils import json_codec
+from utils.resilience import TimeoutPolicy, RetryBudget, CircuitBreaker, backoff_delay
+from utils.metrics import ADMIN_LOGINS, BACKEND_DURATION, BACKEND_RELOGINS
 
 logger = logging.getLogger(__name__)
 
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+
+# Path segments that are ids (UUIDs, numbers) collapse to {id} in metric labels
+_ID_SEGMENT = re.compile(r"^(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)$")
+
+
+def endpoint_template(path: str) -> str:
+    """"/orders/3f2a...?x=1" -> "/orders/{id}", keeping label cardinality bounded."""
+    path = path.split("?", 1)[0]
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+def jwt_expiry(token: Optional[str]) -> Optional[float]:
+    """Read the `exp` claim (unix time) from a JWT without verifying it."""
+    if not token:
+        return None
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
 
 class BackendAPI:
     def __init__(self):
         self.base_url = API_URL
         self.session: Optional[aiohttp.ClientSession] = None
         self._admin_token: Optional[str] = None
+        self._admin_token_exp: Optional[float] = None
+        self._admin_refresh: Optional[asyncio.Task] = None
+        # Single-flight GETs: (path, Authorization) -> in-flight task
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self.coalesce_stats = {"requests": 0, "coalesced": 0}
+        self._pool_stats = {"created": 0, "reused": 0, "queued": 0, "queue_wait_seconds": 0.0}
+        self.timeouts = TimeoutPolicy(BACKEND_TIMEOUT, BACKEND_TIMEOUT_OVERRIDES)
+        self.retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_MIN_PER_SECOND)
+        self.breaker = CircuitBreaker(
+            BREAKER_ERROR_THRESHOLD, BREAKER_MIN_REQUESTS, BREAKER_WINDOW, BREAKER_OPEN_SECONDS, name="backend"
+        )
+        # Shared by all users: keyed by (endpoint, parent_id/group_id)
+        self.catalog_cache = TTLCache(CATALOG_CACHE_TTL, CATALOG_CACHE_STALE_TTL, name="catalog")
+        # telegram_id -> login response (access_token + user), expires with the token
+        self.user_tokens = LRUCache(USER_TOKEN_CACHE_SIZE, name="user_tokens")
+        # telegram_id -> user profile (id, phone, full_name, is_active, lang)
+        self.user_profiles = LRUCache(PROFILE_CACHE_SIZE, name="user_profiles")
 
     async def get_session(self) -> aiohttp.ClientSession:
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(
+                limit=BACKEND_POOL_LIMIT,
+                limit_per_host=BACKEND_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=BACKEND_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=BACKEND_DNS_TTL,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=BACKEND_TIMEOUT, connect=BACKEND_CONNECT_TIMEOUT),
+                trace_configs=[self._pool_trace_config()],
+                json_serialize=json_codec.dumps,
+            )
         return self.session
 
+    def _pool_trace_config(self) -> aiohttp.TraceConfig:
+        """Count new vs reused connections and waits for a free pool slot."""
+        stats = self._pool_stats
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued_at = time.monotonic()
+            stats["queued"] += 1
+
+        async def on_queued_end(session, ctx, params):
+            stats["queue_wait_seconds"] += time.monotonic() - ctx.queued_at
+
+        async def on_create_end(session, ctx, params):
+            stats["created"] += 1
+
+        async def on_reuse(session, ctx, params):
+            stats["reused"] += 1
+
+        trace_config.on_connection_queued_start.append(on_queued_start)
+        trace_config.on_connection_queued_end.append(on_queued_end)
+        trace_config.on_connection_create_end.append(on_create_end)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool counters plus current usage."""
+        stats = dict(self._pool_stats)
+        connector = self.session.connector if self.session and not self.session.closed else None
+        # aiohttp has no public API for these, so read them defensively
+        stats["in_use"] = len(getattr(connector, "_acquired", ())) if connector else 0
+        stats["idle"] = sum(len(conns) for conns in getattr(connector, "_conns", {}).values()) if connector else 0
+        stats["limit"] = BACKEND_POOL_LIMIT
+        stats["limit_per_host"] = BACKEND_POOL_LIMIT_PER_HOST
+        total = stats["created"] + stats["reused"]
+        stats["reuse_ratio"] = round(stats["reused"] / total, 3) if total else 0.0
+        return stats
+
+    async def log_pool_stats(self, interval: float):
+        """Periodically log pool saturation and reuse, for sizing BACKEND_POOL_LIMIT."""
+        while True:
+            await asyncio.sleep(interval)
+            logger.info(f"Backend pool stats: {self.pool_stats()}")
+
     async def close(self):
         if self.session and not self.session.closed:
             await self.session.close()
@@ -30,53 +142,172 @@ class BackendAPI:
                 "username": ADMIN_USERNAME,
                 "password": ADMIN_PASSWORD
             }
-            async with session.post(f"{self.base_url}/auth/login", json=payload) as response:
+            timeout = aiohttp.ClientTimeout(total=self.timeouts.for_request("POST", "/auth/login"))
+            async with session.post(f"{self.base_url}/auth/login", json=payload, timeout=timeout) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = json_codec.loads(await response.read())
                     self._admin_token = data.get("access_token")
+                    self._admin_token_exp = jwt_expiry(self._admin_token)
                     logger.info("Admin login successful")
+                    ADMIN_LOGINS.inc(result="ok")
                     return True
                 logger.error(f"Admin login failed: {response.status} - {await response.text()}")
+                ADMIN_LOGINS.inc(result="failed")
                 return False
         except Exception as e:
             logger.error(f"Admin login error: {e}")
+            ADMIN_LOGINS.inc(result="error")
             return False
 
+    async def _refresh_admin_token(self, stale_token: Optional[str] = None) -> Optional[str]:
+        """Single-flight admin re-login.
+
+        Concurrent callers share one in-flight login. If the token has already
+        been replaced since `stale_token` was used, the new one is returned as is.
+        """
+        if self._admin_token and self._admin_token != stale_token:
+            return self._admin_token
+        if self._admin_refresh is None or self._admin_refresh.done():
+            self._admin_refresh = asyncio.create_task(self.admin_login())
+        await asyncio.shield(self._admin_refresh)
+        return self._admin_token
+
+    async def _get_admin_token(self) -> Optional[str]:
+        """Current admin token, refreshed before it expires."""
+        token = self._admin_token
+        if not token:
+            return await self._refresh_admin_token()
+        if self._admin_token_exp is None:
+            return token
+
+        remaining = self._admin_token_exp - time.time()
+        if remaining <= 0:
+            # Expired: queue behind the refresh instead of sending a doomed request
+            return await self._refresh_admin_token(stale_token=token)
+        if remaining < TOKEN_REFRESH_MARGIN and (self._admin_refresh is None or self._admin_refresh.done()):
+            # Expiring soon: refresh in the background, keep using the current token
+            self._admin_refresh = asyncio.create_task(self.admin_login())
+        return token
+
     async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
-        """Unified request handler with automatic authentication."""
-        session = await self.get_session()
-        url = f"{self.base_url}{path}"
-        
-        # Internal flag to prevent infinite recursion
-        is_retry = kwargs.pop("_is_retry", False)
-        
-        headers = kwargs.get("headers", {})
-        if "Authorization" not in headers:
-            # Always ensure we have an admin token
-            if not self._admin_token:
-                await self.admin_login()
+        """Unified request handler with automatic authentication.
+
+        Identical GETs that are already in flight share one HTTP call and one
+        decoded response. Callers must treat the returned data as read-only.
+        """
+        if method != "GET" or kwargs.get("json") is not None:
+            return await self._send(method, path, **kwargs)
+
+        key = (path, kwargs.get("headers", {}).get("Authorization"))
+        self.coalesce_stats["requests"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesce_stats["coalesced"] += 1
+        else:
+            task = asyncio.create_task(self._send(method, path, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled waiter does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _attempt(self, session: aiohttp.ClientSession, method: str, url: str, **kwargs) -> Tuple[Optional[int], Any]:
+        """One HTTP exchange. Returns (status, decoded JSON or error text); status is None on network errors."""
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                if response.status in [200, 201]:
+                    return response.status, json_codec.loads(await response.read())
+                return response.status, await response.text()
+        except ValueError as e:
+            return None, f"Invalid JSON: {e}"
+        except asyncio.TimeoutError:
+            return None, "Timeout"
+        except aiohttp.ClientError as e:
+            return None, str(e) or type(e).__name__
+
+    async def _send(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """Perform one logical request: timeout, bounded retries for idempotent
+        calls, one re-login on 401, all behind the circuit breaker."""
+        endpoint = endpoint_template(path)
+        permit = self.breaker.allow()
+        if permit is None:
+            logger.warning(f"Circuit breaker open, failing fast: {method} {path}")
+            BACKEND_DURATION.observe(0.0, method=method, endpoint=endpoint, status="rejected")
+            return {"error": "Backend unavailable", "detail": "circuit breaker open"}
+
+        outcome: Optional[bool] = None
+        status: Optional[int] = None
+        started = time.perf_counter()
+        try:
+            session = await self.get_session()
+            url = f"{self.base_url}{path}"
             
-            if self._admin_token:
-                headers["Authorization"] = f"Bearer {self._admin_token}"
-            else:
-                logger.warning(f"No admin authentication token available for request: {method} {path}")
-        
-        kwargs["headers"] = headers
-
-        async with session.request(method, url, **kwargs) as response:
-            if response.status == 401 and not is_retry:
-                # Admin token might have expired, try to login again and retry
-                if await self.admin_login():
-                    kwargs["_is_retry"] = True
-                    headers["Authorization"] = f"Bearer {self._admin_token}"
-                    return await self._request(method, path, **kwargs)
+            # Internal flag to prevent infinite recursion
+            is_retry = kwargs.pop("_is_retry", False)
+            
+            headers = kwargs.get("headers", {})
+            admin_token = None
+            if "Authorization" not in headers:
+                # Always ensure we have a valid admin token
+                admin_token = await self._get_admin_token()
                 
-            if response.status in [200, 201]:
-                return await response.json()
+                if admin_token:
+                    headers["Authorization"] = f"Bearer {admin_token}"
+                else:
+                    logger.warning(f"No admin authentication token available for request: {method} {path}")
             
-            error_data = await response.text()
-            logger.error(f"API Request Failed: {method} {path} - Status: {response.status} - Body: {error_data}")
-            return {"error": f"Status {response.status}", "detail": error_data}
+            kwargs["headers"] = headers
+            kwargs.setdefault("timeout", aiohttp.ClientTimeout(total=self.timeouts.for_request(method, path)))
+            self.retry_budget.deposit()
+
+            attempt = 0
+            while True:
+                status, result = await self._attempt(session, method, url, **kwargs)
+
+                if status == 401 and not is_retry:
+                    # Admin token might have expired; all 401s share one re-login, then retry
+                    BACKEND_RELOGINS.inc()
+                    new_token = await self._refresh_admin_token(stale_token=admin_token)
+                    if new_token:
+                        is_retry = True
+                        admin_token = new_token
+                        headers["Authorization"] = f"Bearer {new_token}"
+                        continue
+
+                transient = status is None or status >= 500
+                if (
+                    transient
+                    and method in IDEMPOTENT_METHODS
+                    and attempt < RETRY_MAX
+                    and self.retry_budget.try_withdraw()
+                ):
+                    delay = backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+                    logger.warning(f"Retrying {method} {path} in {delay:.2f}s after {status or result}")
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                break
+
+            outcome = not transient
+            if status in [200, 201]:
+                return result
+
+            if status is None:
+                logger.error(f"API Request Failed: {method} {path} - {result}")
+                return {"error": "Backend unavailable", "detail": result}
+
+            logger.error(f"API Request Failed: {method} {path} - Status: {status} - Body: {result}")
+            return {"error": f"Status {status}", "detail": result}
+        finally:
+            if outcome is None:
+                self.breaker.abandon(permit)
+            else:
+                self.breaker.record(permit, outcome)
+            BACKEND_DURATION.observe(
+                time.perf_counter() - started,
+                method=method,
+                endpoint=endpoint,
+                status=str(status) if status is not None else ("error" if outcome is not None else "cancelled"),
+            )
 
     async def register_user(self, telegram_id: str, phone_number: str, full_name: str, language: str) -> Dict[str, Any]:
         """Register a new user via Telegram."""
@@ -86,29 +317,77 @@ class BackendAPI:
             "full_name": full_name,
             "current_lang": language
         }
-        return await self._request("POST", "/auth/telegram/register", json=payload)
+        res = await self._request("POST", "/auth/telegram/register", json=payload)
+        self.invalidate_user(telegram_id)
+        return res
 
     async def login_user(self, telegram_id: str) -> Dict[str, Any]:
-        """Login user via Telegram ID."""
-        payload = {"telegram_id": str(telegram_id)}
-        return await self._request("POST", "/auth/telegram/login", json=payload)
+        """Login user via Telegram ID. Tokens are cached until shortly before they expire."""
+        telegram_id = str(telegram_id)
+        cached = self.user_tokens.get(telegram_id)
+        if cached is not None:
+            return cached
+
+        payload = {"telegram_id": telegram_id}
+        res = await self._request("POST", "/auth/telegram/login", json=payload)
+        if "access_token" in res:
+            exp = jwt_expiry(res["access_token"])
+            expires_at = exp - TOKEN_REFRESH_MARGIN if exp else time.time() + USER_TOKEN_DEFAULT_TTL
+            self.user_tokens.set(telegram_id, res, expires_at)
+        else:
+            self.user_tokens.invalidate(telegram_id)
+        return res
 
     async def get_user(self, telegram_id: str) -> Optional[Dict[str, Any]]:
-        """Get user details by Telegram ID. Uses admin token."""
+        """Get user details by Telegram ID. Uses admin token. Cached for PROFILE_CACHE_TTL."""
+        telegram_id = str(telegram_id)
+        cached = self.user_profiles.get(telegram_id)
+        if cached is not None:
+            return cached
+
         res = await self._request("GET", f"/users/telegram/{telegram_id}")
         if "error" in res:
             return None
+        self.user_profiles.set(telegram_id, res, time.time() + PROFILE_CACHE_TTL)
         return res
 
+    def invalidate_user(self, telegram_id: str):
+        """Drop everything cached for a user, e.g. after an admin activates them."""
+        telegram_id = str(telegram_id)
+        self.user_profiles.invalidate(telegram_id)
+        self.user_tokens.invalidate(telegram_id)
+
     async def get_groups(self, parent_id: str = None) -> Dict[str, Any]:
-        """Fetch groups."""
+        """Fetch groups (cached)."""
         path = "/groups?limit=10000"
         path += f"&parent_id={parent_id if parent_id else 'null'}"
-        return await self._request("GET", path)
+        return await self.catalog_cache.get_or_fetch(
+            ("groups", parent_id or None),
+            lambda: self._request("GET", path),
+            should_cache=_is_success
+        )
 
     async def get_products(self, group_id: str) -> Dict[str, Any]:
-        """Fetch products for a group."""
-        return await self._request("GET", f"/products?group_id={group_id}&limit=10000")
+        """Fetch products for a group (cached)."""
+        path = f"/products?group_id={group_id}&limit=10000"
+        return await self.catalog_cache.get_or_fetch(
+            ("products", group_id),
+            lambda: self._request("GET", path),
+            should_cache=_is_success
+        )
+
+    def invalidate_catalog(self, endpoint: str = None, key_id: str = None):
+        """Drop cached catalog responses.
+
+        With no arguments everything is dropped; `endpoint` ("groups" or
+        "products") narrows it down, and `key_id` targets a single parent/group.
+        """
+        if endpoint is None:
+            self.catalog_cache.invalidate()
+        elif key_id is None:
+            self.catalog_cache.invalidate_where(lambda key: key[0] == endpoint)
+        else:
+            self.catalog_cache.invalidate((endpoint, key_id))
 
     async def search_products(self, query: str, limit: int = 20) -> Dict[str, Any]:
         """Search products by name."""
@@ -136,16 +415,34 @@ class BackendAPI:
     async def update_lang(self, telegram_id: str, lang: str):
         """Update user language."""
         payload = {"current_lang": lang}
-        await self._request("PUT", "/users/me/profile", json=payload)
+        res = await self._request("PUT", "/users/me/profile", json=payload)
+        if "error" in res:
+            self.invalidate_user(telegram_id)
+            return
+
+        # Write through so cached profile and login payload show the new language
+        telegram_id = str(telegram_id)
+        profile = self.user_profiles.get(telegram_id)
+        if profile is not None:
+            self.user_profiles.set(telegram_id, {**profile, "current_lang": lang}, time.time() + PROFILE_CACHE_TTL)
+        login = self.user_tokens.peek(telegram_id)
+        if login is not None and login[0].get("user"):
+            login_data, expires_at = login
+            user = {**login_data["user"], "current_lang": lang}
+            self.user_tokens.set(telegram_id, {**login_data, "user": user}, expires_at)
 
-    async def update_order_message_id(self, order_id: str, message_id: int):
+    async def update_order_message_id(self, order_id: str, message_id: int) -> Dict[str, Any]:
         """Update order with telegram message ID."""
         payload = {"telegram_message_id": message_id}
-        await self._request("PATCH", f"/orders/{order_id}", json=payload)
+        return await self._request("PATCH", f"/orders/{order_id}", json=payload)
 
     async def update_order_status(self, order_id: str, status: str) -> Dict[str, Any]:
         """Update order status."""
         payload = {"status": status}
         return await self._request("PATCH", f"/orders/{order_id}", json=payload)
 
+def _is_success(res: Dict[str, Any]) -> bool:
+    return isinstance(res, dict) and "error" not in res
+
+
 api_client = BackendAPI()
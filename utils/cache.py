@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Process-wide async cache with TTL and stale-while-revalidate refresh.
+
+    Entries younger than `ttl` are served as is. Entries older than `ttl` but
+    younger than `ttl + stale_ttl` are served immediately while a single
+    background task refreshes them. Anything older is fetched inline.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, name: str = "cache"):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._refreshing: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """Return cached value for key, fetching (or refreshing) it when needed."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = now - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._schedule_refresh(key, fetch, should_cache)
+                return value
+
+        self.misses += 1
+        value = await fetch()
+        if should_cache(value):
+            self._entries[key] = (value, time.monotonic())
+        return value
+
+    def _schedule_refresh(self, key: Hashable, fetch, should_cache):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, fetch, should_cache))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: Hashable, fetch, should_cache):
+        try:
+            value = await fetch()
+            if should_cache(value):
+                self._entries[key] = (value, time.monotonic())
+        except Exception as e:
+            logger.warning(f"Background refresh failed for {self.name} {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (value, time.monotonic())
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value regardless of age, or None."""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one key, or every key when called without arguments."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LRUCache:
+    """Bounded LRU cache where every entry carries its own expiry (unix time)."""
+
+    def __init__(self, maxsize: int, name: str = "lru"):
+        self.maxsize = maxsize
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return (value, expires_at) without touching LRU order or stats."""
+        return self._entries.get(key)
+
+    def set(self, key: Hashable, value: Any, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
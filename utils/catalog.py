@@ -0,0 +1,184 @@
+"""
+In-memory catalog tree index.
+
+The whole group/product tree is snapshotted at startup and refreshed in the
+background, so catalog navigation (children, products, parent, emptiness
+checks) is answered from dicts without any network I/O.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from data.config import CATALOG_REFRESH_INTERVAL, CATALOG_LOAD_CONCURRENCY
+from utils.api import api_client
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogIndex:
+    def __init__(self):
+        self.groups_by_id: Dict[str, Dict[str, Any]] = {}
+        self.children_by_parent: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        self.products_by_group: Dict[str, List[Dict[str, Any]]] = {}
+        self.products_by_id: Dict[str, Dict[str, Any]] = {}
+        self.parent_of: Dict[str, Optional[str]] = {}
+        self.ready = False
+        self.version = 0
+        self.loaded_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[], None]] = []
+        # Button text -> item, shared by all users, per (parent_id, lang)
+        self._name_maps: Dict[Tuple[Optional[str], str], Dict[str, Dict[str, Any]]] = {}
+
+    # --- Lookups (O(1), no I/O) ---
+    def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
+        return self.groups_by_id.get(group_id)
+
+    def get_product(self, product_id: str) -> Optional[Dict[str, Any]]:
+        return self.products_by_id.get(product_id)
+
+    def children(self, parent_id: Optional[str]) -> List[Dict[str, Any]]:
+        return self.children_by_parent.get(parent_id or None, [])
+
+    def products(self, group_id: Optional[str]) -> List[Dict[str, Any]]:
+        if not group_id:
+            return []
+        return self.products_by_group.get(group_id, [])
+
+    def items(self, parent_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Groups followed by products, as shown on a catalog page."""
+        return self.children(parent_id) + self.products(parent_id)
+
+    def parent(self, group_id: Optional[str]) -> Optional[str]:
+        if not group_id:
+            return None
+        return self.parent_of.get(group_id)
+
+    def is_empty(self, group_id: Optional[str]) -> bool:
+        return not self.children(group_id) and not self.products(group_id)
+
+    async def fetch_items(self, parent_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Items for a catalog page, from the index or the (cached) API until it is loaded."""
+        if self.ready:
+            return self.items(parent_id)
+
+        groups_res = await api_client.get_groups(parent_id=parent_id)
+        groups = groups_res.get("items", [])
+
+        products = []
+        if parent_id:
+            products_res = await api_client.get_products(group_id=parent_id)
+            products = products_res.get("items", [])
+
+        return groups + products
+
+    async def resolve(self, parent_id: Optional[str], lang: str, text: str) -> Optional[Dict[str, Any]]:
+        """Find the group or product on a catalog page by its button text."""
+        key = (parent_id or None, lang)
+        name_map = self._name_maps.get(key) if self.ready else None
+        if name_map is None:
+            name_map = {}
+            for item in await self.fetch_items(parent_id):
+                name = item.get(f"name_{lang}", item.get("name_ru", item.get("name", "Unknown")))
+                name_map[name.strip()] = item
+            if self.ready:
+                self._name_maps[key] = name_map
+        return name_map.get(text.strip())
+
+    def add_listener(self, callback: Callable[[], None]):
+        """Register a callback run after every successful snapshot swap."""
+        self._listeners.append(callback)
+
+    # --- Loading ---
+    async def load(self) -> bool:
+        """Build a fresh snapshot of the catalog tree and swap it in atomically."""
+        groups_by_id: Dict[str, Dict[str, Any]] = {}
+        children_by_parent: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        products_by_group: Dict[str, List[Dict[str, Any]]] = {}
+        products_by_id: Dict[str, Dict[str, Any]] = {}
+        parent_of: Dict[str, Optional[str]] = {}
+        semaphore = asyncio.Semaphore(CATALOG_LOAD_CONCURRENCY)
+        failed = False
+
+        async def visit(parent_id: Optional[str]):
+            nonlocal failed
+            async with semaphore:
+                groups_res = await api_client.get_groups(parent_id=parent_id)
+                products_res = (
+                    await api_client.get_products(group_id=parent_id) if parent_id else {"items": []}
+                )
+            if "error" in groups_res or "error" in products_res:
+                failed = True
+                return
+
+            groups = groups_res.get("items", [])
+            products = products_res.get("items", [])
+            children_by_parent[parent_id] = groups
+            if parent_id:
+                products_by_group[parent_id] = products
+                for product in products:
+                    products_by_id[product["id"]] = product
+
+            new_groups = []
+            for group in groups:
+                group_id = group["id"]
+                if group_id in groups_by_id:
+                    continue  # Guard against cycles in backend data
+                groups_by_id[group_id] = group
+                parent_of[group_id] = parent_id
+                new_groups.append(group_id)
+            await asyncio.gather(*(visit(group_id) for group_id in new_groups))
+
+        try:
+            await visit(None)
+        except Exception as e:
+            logger.error(f"Catalog index load error: {e}")
+            return False
+
+        if failed:
+            logger.warning("Catalog index load incomplete, keeping previous snapshot")
+            return False
+
+        self.groups_by_id = groups_by_id
+        self.children_by_parent = children_by_parent
+        self.products_by_group = products_by_group
+        self.products_by_id = products_by_id
+        self.parent_of = parent_of
+        self._name_maps = {}
+        self.ready = True
+        self.version += 1
+        self.loaded_at = time.monotonic()
+        logger.info(f"Catalog index loaded: {len(groups_by_id)} groups, {len(products_by_id)} products")
+
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Catalog listener {callback} failed: {e}")
+        return True
+
+    async def _refresh_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            # Bypass the response cache so the snapshot reflects the backend
+            api_client.invalidate_catalog()
+            await self.load()
+
+    def start(self, interval: float = CATALOG_REFRESH_INTERVAL):
+        """Start periodic background refresh."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+catalog_index = CatalogIndex()
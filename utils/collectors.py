@@ -0,0 +1,138 @@
+"""
+Scrape-time metric collectors for stats the bot's components already keep.
+"""
+
+import time
+from typing import Any, Iterable, Optional
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from utils.api import api_client
+from utils.catalog import catalog_index
+from utils.history import history_cache
+from utils.media import file_id_cache
+from utils.metrics import REGISTRY
+from utils.outbox import order_outbox
+from utils.resilience import CircuitBreaker
+from utils.search import search_index
+from utils.storage import SQLiteStorage
+
+
+def _caches():
+    from keyboards.default.catalog import catalog_keyboard_cache
+
+    catalog = api_client.catalog_cache
+    yield "catalog", catalog.hits, catalog.stale_hits, catalog.misses, len(catalog)
+    for cache in (api_client.user_tokens, api_client.user_profiles, history_cache, catalog_keyboard_cache):
+        yield cache.name, cache.hits, None, cache.misses, len(cache)
+    yield "search_queries", search_index.hits, None, search_index.misses, search_index.query_cache_size
+
+
+def collect_caches():
+    caches = list(_caches())
+    yield "bot_cache_requests_total", "counter", "Cache lookups by result", [
+        ({"cache": name, "result": result}, value)
+        for name, hits, stale, misses, _ in caches
+        for result, value in (("hit", hits), ("stale", stale), ("miss", misses))
+        if value is not None  # Only the catalog cache serves stale entries
+    ]
+    yield "bot_cache_entries", "gauge", "Entries currently cached", [
+        ({"cache": name}, size) for name, _, _, _, size in caches
+    ]
+    yield "bot_file_id_cache_entries", "gauge", "Product photos with a cached Telegram file_id", [({}, len(file_id_cache))]
+
+
+def collect_backend():
+    stats = api_client.pool_stats()
+    yield "bot_backend_pool_connections", "gauge", "Backend connections by state", [
+        ({"state": "in_use"}, stats["in_use"]), ({"state": "idle"}, stats["idle"])
+    ]
+    yield "bot_backend_pool_connections_created_total", "counter", "New backend connections", [({}, stats["created"])]
+    yield "bot_backend_pool_connections_reused_total", "counter", "Reused backend connections", [({}, stats["reused"])]
+    yield "bot_backend_pool_queued_total", "counter", "Requests that waited for a pool slot", [({}, stats["queued"])]
+    yield "bot_backend_pool_queue_wait_seconds_total", "counter", "Time spent waiting for a pool slot", [
+        ({}, stats["queue_wait_seconds"])
+    ]
+    yield "bot_backend_get_requests_total", "counter", "GET requests before coalescing", [
+        ({}, api_client.coalesce_stats["requests"])
+    ]
+    yield "bot_backend_coalesced_requests_total", "counter", "GET requests served by an identical in-flight call", [
+        ({}, api_client.coalesce_stats["coalesced"])
+    ]
+
+    breaker = api_client.breaker
+    yield "bot_backend_breaker_state", "gauge", "Circuit breaker state (1 for the current one)", [
+        ({"state": state}, 1 if breaker.state == state else 0)
+        for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+    ]
+    yield "bot_backend_breaker_error_rate", "gauge", "Error rate over the breaker window", [({}, breaker.error_rate)]
+    yield "bot_backend_breaker_rejected_total", "counter", "Calls failed fast by the open breaker", [({}, breaker.rejected)]
+    yield "bot_backend_retry_budget_exhausted_total", "counter", "Retries refused by the retry budget", [
+        ({}, api_client.retry_budget.exhausted)
+    ]
+
+
+def collect_catalog():
+    yield "bot_catalog_version", "gauge", "Catalog snapshots loaded since start", [({}, catalog_index.version)]
+    age = time.monotonic() - catalog_index.loaded_at if catalog_index.ready else 0
+    yield "bot_catalog_age_seconds", "gauge", "Age of the current catalog snapshot", [({}, age)]
+
+
+def collect_outbox():
+    yield "bot_outbox_delivered_total", "counter", "Admin notifications delivered", [({}, order_outbox.delivered)]
+    yield "bot_outbox_retried_total", "counter", "Admin notification attempts scheduled for retry", [({}, order_outbox.retried)]
+    yield "bot_outbox_dead_lettered_total", "counter", "Admin notifications given up on", [({}, order_outbox.dead_lettered)]
+    yield "bot_outbox_jobs", "gauge", "Outbox jobs by status as of the last drain", [
+        ({"status": status}, count) for status, count in order_outbox.status_counts.items()
+    ]
+
+
+def register_collectors(storage: BaseStorage, ordering: Optional[Any] = None, send_scheduler: Optional[Any] = None):
+    """Expose component stats on the metrics endpoint."""
+    REGISTRY.add_collector(collect_caches)
+    REGISTRY.add_collector(collect_backend)
+    REGISTRY.add_collector(collect_catalog)
+    REGISTRY.add_collector(collect_outbox)
+
+    def collect_storage() -> Iterable:
+        if isinstance(storage, SQLiteStorage):
+            size, dirty = len(storage), storage.pending_writes
+        elif isinstance(storage, MemoryStorage):
+            size, dirty = len(storage.storage), 0
+        else:
+            return
+        yield "bot_fsm_storage_keys", "gauge", "FSM records held in memory", [({}, size)]
+        yield "bot_fsm_storage_dirty_keys", "gauge", "FSM records not yet flushed to disk", [({}, dirty)]
+
+    REGISTRY.add_collector(collect_storage)
+
+    if ordering is not None:
+        def collect_updates() -> Iterable:
+            yield "bot_updates_in_flight", "gauge", "Updates being handled now", [({}, ordering.in_flight)]
+            yield "bot_updates_queued", "gauge", "Updates waiting in per-chat lanes", [({}, ordering.queued)]
+            yield "bot_updates_dropped_total", "counter", "Updates dropped because a chat's lane was full", [
+                ({}, ordering.dropped)
+            ]
+            yield "bot_updates_merged_total", "counter", "Duplicate or superseded updates skipped", [({}, ordering.merged)]
+
+        REGISTRY.add_collector(collect_updates)
+
+    if send_scheduler is not None:
+        def collect_sends() -> Iterable:
+            stats = send_scheduler.stats()
+            yield "bot_send_queue_depth", "gauge", "Outgoing messages waiting for a global slot", [
+                ({"priority": priority}, depth) for priority, depth in stats["queued"].items()
+            ]
+            yield "bot_send_waiting_chat", "gauge", "Outgoing messages waiting on a per-chat limit", [
+                ({}, stats["waiting_chat"])
+            ]
+            yield "bot_send_sent_total", "counter", "Messages sent through the scheduler", [({}, stats["sent"])]
+            yield "bot_send_retry_after_total", "counter", "Flood-wait (retry_after) replies", [
+                ({}, stats["retry_after_hits"])
+            ]
+            yield "bot_send_retry_after_seconds_total", "counter", "Seconds of flood wait requested", [
+                ({}, stats["retry_after_seconds"])
+            ]
+
+        REGISTRY.add_collector(collect_sends)
@@ -0,0 +1,66 @@
+"""
+Paginated order history.
+
+Only the page being shown is fetched from the backend (one extra order tells
+whether a next page exists), and rendered pages are cached per user until an
+order of theirs is created or changes status.
+"""
+
+import time
+from typing import Optional, Tuple
+
+from data.config import HISTORY_PAGE_SIZE, HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL
+from utils.api import api_client, _is_success
+from utils.cache import LRUCache
+from utils.localization import add_reload_listener, get_text, format_price
+
+STATUS_ICONS = {
+    "pending": "⏳",
+    "confirmed": "✅",
+    "declined": "❌"
+}
+
+# (user_id, page, lang) -> (text, has_next); text is None for an empty page
+history_cache = LRUCache(HISTORY_CACHE_SIZE, name="order_history")
+add_reload_listener(history_cache.invalidate)
+
+
+async def get_history_page(user_id: str, page: int, lang: str) -> Tuple[Optional[str], bool]:
+    """Rendered history page and whether there is a next one."""
+    key = (str(user_id), page, lang)
+    cached = history_cache.get(key)
+    if cached is not None:
+        return cached
+
+    res = await api_client.get_user_orders(user_id, skip=page * HISTORY_PAGE_SIZE, limit=HISTORY_PAGE_SIZE + 1)
+    orders = res.get("items", [])
+    has_next = len(orders) > HISTORY_PAGE_SIZE
+    orders = orders[:HISTORY_PAGE_SIZE]
+
+    if not orders:
+        result = (None, False)
+    else:
+        msg_text = f"{get_text('history_title', lang)}\n\n"
+        for order in orders:
+            order_num = order.get("order_number", "???")
+            status = order.get("status", "pending")
+            date = order.get("created_at", "").split("T")[0]
+            total = order.get("total_amount", 0)
+
+            status_icon = STATUS_ICONS.get(status, "❓")
+            msg_text += f"{status_icon} Order #{order_num} | {date} | {format_price(float(total))}\n"
+        result = (msg_text, has_next)
+
+    # Backend errors are not cached
+    if _is_success(res):
+        history_cache.set(key, result, time.time() + HISTORY_CACHE_TTL)
+    return result
+
+
+def invalidate_order_history(user_id: Optional[str] = None):
+    """Drop one user's cached pages, or everyone's when the user is unknown."""
+    if user_id is None:
+        history_cache.invalidate()
+    else:
+        user_id = str(user_id)
+        history_cache.invalidate_where(lambda key: key[0] == user_id)
@@ -0,0 +1,40 @@
+"""
+Pluggable JSON codec.
+
+Uses orjson or ujson when installed and falls back to the standard library.
+`loads` accepts str or bytes; `dumps` returns compact str, as aiohttp and
+aiogram expect.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+
+    def loads(data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    CODEC = "orjson"
+except ImportError:
+    try:
+        import ujson
+
+        def loads(data: Union[str, bytes]) -> Any:
+            return ujson.loads(data)
+
+        def dumps(obj: Any) -> str:
+            return ujson.dumps(obj, ensure_ascii=False)
+
+        CODEC = "ujson"
+    except ImportError:
+        def loads(data: Union[str, bytes]) -> Any:
+            return json.loads(data)
+
+        def dumps(obj: Any) -> str:
+            return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+        CODEC = "json"
@@ -1,21 +1,94 @@
+import asyncio
 import json
+import logging
 import os
+from typing import Callable, Dict, List, Optional, Tuple
 from data.config import ADMINS
 
-# Load locales
+logger = logging.getLogger(__name__)
+
 LOCALES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "locales.json")
-with open(LOCALES_PATH, "r", encoding="utf-8") as f:
-    LOCALE_DATA = json.load(f)
+LANGUAGES = ("uz", "ru", "en")
+DEFAULT_LANG = "ru"
+
+# Compiled from locales.json: one flat key -> text table per language with the
+# fallback to DEFAULT_LANG (or the key itself) already applied, and a reverse
+# index from text to (key, lang) for classifying button presses.
+LOCALE_DATA: Dict[str, Dict[str, str]] = {}
+TEXTS: Dict[str, Dict[str, str]] = {}
+REVERSE_INDEX: Dict[str, Tuple[str, str]] = {}
+LOCALE_VERSION = 0
+
+_loaded_mtime: Optional[float] = None
+_reload_listeners: List[Callable[[], None]] = []
+
+
+def _compile(data: Dict[str, Dict[str, str]]):
+    texts = {
+        lang: {key: values.get(lang, values.get(DEFAULT_LANG, key)) for key, values in data.items()}
+        for lang in LANGUAGES
+    }
+    reverse: Dict[str, Tuple[str, str]] = {}
+    # Only texts actually written for a language; fallbacks must not shadow them
+    for key, values in data.items():
+        for lang, text in values.items():
+            reverse.setdefault(text, (key, lang))
+    return texts, reverse
+
+
+def load_locales() -> bool:
+    """(Re)compile locales.json if it changed on disk; returns True when reloaded."""
+    global LOCALE_DATA, TEXTS, REVERSE_INDEX, LOCALE_VERSION, _loaded_mtime
+    mtime = os.path.getmtime(LOCALES_PATH)
+    if mtime == _loaded_mtime:
+        return False
+
+    with open(LOCALES_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    texts, reverse = _compile(data)
+    # Swap in one step so readers never see a half-built table
+    LOCALE_DATA, TEXTS, REVERSE_INDEX = data, texts, reverse
+    LOCALE_VERSION += 1
+    _loaded_mtime = mtime
+
+    for callback in _reload_listeners:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Locale reload listener {callback} failed: {e}")
+    return True
+
+
+def add_reload_listener(callback: Callable[[], None]):
+    """Register a callback run after locales are recompiled (e.g. to drop cached keyboards)."""
+    _reload_listeners.append(callback)
+
+
+async def watch_locales(interval: float):
+    """Reload locales.json whenever its mtime changes."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if load_locales():
+                logger.info(f"Reloaded {LOCALES_PATH} (version {LOCALE_VERSION})")
+        except (OSError, ValueError) as e:
+            # Keep serving the last good tables while the file is being edited
+            logger.error(f"Failed to reload locales: {e}")
+
+
+load_locales()
+
 
 def get_text(key: str, lang: str = "ru") -> str:
     """Get localized text."""
-    if key not in LOCALE_DATA:
-        return key
-    
-    try:
-        return LOCALE_DATA[key][lang]
-    except KeyError:
-        return LOCALE_DATA[key].get("ru", key)  # Fallback
+    table = TEXTS.get(lang) or TEXTS[DEFAULT_LANG]
+    return table.get(key, key)
+
+
+def text_key(text: Optional[str]) -> Optional[str]:
+    """Locale key of a button text in any language, or None."""
+    match = REVERSE_INDEX.get(text)
+    return match[0] if match else None
 
 
 def format_price(amount) -> str:
@@ -0,0 +1,234 @@
+"""
+Product photo delivery and image fetching.
+
+Telegram returns a file_id after the first upload of a photo; re-sending by
+file_id skips both the download from the backend and the upload. The mapping
+product_id -> (image URL, file_id) is persisted to disk and an entry is
+dropped as soon as the product's image URL changes. Changes are written
+behind: the file is rewritten at most every `flush_interval` seconds from a
+worker thread, and once more on shutdown.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile
+
+from data.config import (
+    FILE_ID_CACHE_PATH, FILE_ID_CACHE_FLUSH_INTERVAL, IMAGE_URL_REWRITES, IMAGE_FETCH_CONCURRENCY,
+    IMAGE_FETCH_TIMEOUT, IMAGE_MAX_BYTES, IMAGE_POOL_LIMIT
+)
+from utils.metrics import IMAGE_FETCH_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class FileIdCache:
+    def __init__(self, path: str, flush_interval: float = FILE_ID_CACHE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._entries: Dict[str, Dict[str, str]] = {}
+        self._dirty = False
+        self._save_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load file_id cache {self.path}: {e}")
+
+    def _write(self, snapshot: Dict[str, Dict[str, str]]):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def flush(self):
+        """Write the cache to disk if it changed since the last write."""
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        async with self._save_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            try:
+                await asyncio.to_thread(self._write, dict(self._entries))
+            except OSError as e:
+                self._dirty = True
+                logger.warning(f"Could not save file_id cache {self.path}: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic write-behind flusher."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def get(self, key: str, url: str) -> Optional[str]:
+        """Return the cached file_id, dropping it if the image URL has changed."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.get("url") != url:
+            del self._entries[key]
+            self._dirty = True
+            return None
+        return entry.get("file_id")
+
+    def contains(self, key: str, url: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.get("url") == url
+
+    def set(self, key: str, url: str, file_id: str):
+        self._entries[key] = {"url": url, "file_id": file_id}
+        self._dirty = True
+
+    def invalidate(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+file_id_cache = FileIdCache(FILE_ID_CACHE_PATH)
+
+
+class ImageFetcher:
+    """Shared image downloader: one pooled session, bounded concurrency,
+    per-request timeout and a cap on body size."""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        rewrites=IMAGE_URL_REWRITES,
+        concurrency: int = IMAGE_FETCH_CONCURRENCY,
+        timeout: float = IMAGE_FETCH_TIMEOUT,
+        max_bytes: int = IMAGE_MAX_BYTES,
+        pool_limit: int = IMAGE_POOL_LIMIT,
+    ):
+        self.rewrites = list(rewrites)
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_bytes = max_bytes
+        self.pool_limit = pool_limit
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def rewrite_url(self, url: str) -> str:
+        """Map public image URLs to the internal network address."""
+        for source, target in self.rewrites:
+            if url.startswith(source):
+                return target + url[len(source):]
+        return url
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_limit)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    async def fetch(self, img_url: str) -> Optional[bytes]:
+        """Download image bytes, or None on HTTP error, timeout or oversize body."""
+        started = time.perf_counter()
+        data = await self._fetch(img_url)
+        IMAGE_FETCH_DURATION.observe(time.perf_counter() - started, result="ok" if data is not None else "failed")
+        return data
+
+    async def _fetch(self, img_url: str) -> Optional[bytes]:
+        url = self.rewrite_url(img_url)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            session = await self.get_session()
+            try:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        logger.warning(f"Failed to download image: HTTP {response.status}")
+                        return None
+                    if response.content_length and response.content_length > self.max_bytes:
+                        logger.warning(f"Image too large ({response.content_length} bytes): {url}")
+                        return None
+
+                    chunks = []
+                    size = 0
+                    async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            logger.warning(f"Image exceeded {self.max_bytes} bytes: {url}")
+                            return None
+                        chunks.append(chunk)
+                    return b"".join(chunks)
+            except asyncio.TimeoutError:
+                logger.warning(f"Image download timed out: {url}")
+                return None
+            except aiohttp.ClientError as e:
+                logger.warning(f"Image download error: {url} - {e}")
+                return None
+
+
+image_fetcher = ImageFetcher()
+
+
+async def send_product_photo(message: types.Message, product: Dict[str, Any], caption: str) -> bool:
+    """Send the product's first image with caption. Returns False if no photo was sent."""
+    images = product.get("images") or []
+    if not images or not images[0]:
+        return False
+
+    img_url = images[0]
+    key = str(product.get("id", img_url))
+
+    file_id = file_id_cache.get(key, img_url)
+    if file_id:
+        try:
+            await message.answer_photo(photo=file_id, caption=caption, parse_mode="HTML")
+            return True
+        except TelegramBadRequest as e:
+            # file_id no longer valid for this bot, upload again
+            logger.warning(f"Cached file_id rejected for product {key}: {e}")
+            file_id_cache.invalidate(key)
+
+    try:
+        image_data = await image_fetcher.fetch(img_url)
+        if image_data is None:
+            return False
+        photo = BufferedInputFile(image_data, filename="product.jpg")
+        sent = await message.answer_photo(photo=photo, caption=caption, parse_mode="HTML")
+        if sent.photo:
+            file_id_cache.set(key, img_url, sent.photo[-1].file_id)
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to send product image: {e}")
+        return False
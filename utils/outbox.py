@@ -0,0 +1,293 @@
+"""
+Durable outbox for admin-group order notifications.
+
+Checkout records a notification job in SQLite keyed by order_id and moves
+on; a background drainer delivers pending jobs in batches: it posts the
+message to the admin group, records the Telegram message_id locally, then
+saves it on the order in the backend. Failed steps are retried with backoff,
+and jobs that keep failing end up as dead letters, which admins list with
+/outbox and retry with /requeue <order_id> in the admin group.
+
+Delivery is idempotent. A job is never enqueued twice for one order, and once
+its message_id is recorded the message is not posted again; only the
+backend update is retried.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from data.config import (
+    ADMIN_GROUP_ID, OUTBOX_DB_PATH, OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL,
+    OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE, OUTBOX_RETRY_CAP, OUTBOX_RETENTION_DAYS
+)
+from utils.api import api_client, _is_success
+from utils.json_codec import dumps, loads
+from utils.resilience import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+# Buttons are stored as rows of (text, callback_data)
+ButtonRows = Sequence[Sequence[Tuple[str, str]]]
+
+
+class NotificationOutbox:
+    def __init__(
+        self,
+        path: str,
+        chat_id: int,
+        batch_size: int = 20,
+        poll_interval: float = 5.0,
+        max_attempts: int = 10,
+        retry_base: float = 5.0,
+        retry_cap: float = 600.0,
+        retention_days: float = 7.0,
+    ):
+        self.path = path
+        self.chat_id = chat_id
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.retention_days = retention_days
+        self.bot: Optional[Bot] = None
+        self.delivered = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        # Jobs per status as of the last drain, for the metrics gauge
+        self.status_counts: Dict[str, int] = {PENDING: 0, SENT: 0, DEAD: 0}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- SQLite (called from worker threads) ---
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "order_id TEXT PRIMARY KEY, text TEXT NOT NULL, buttons TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+                "message_id INTEGER, last_error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        with self._db_lock:
+            conn = self._db()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+
+    def _executemany(self, sql: str, rows: List[Sequence[Any]]):
+        with self._db_lock:
+            conn = self._db()
+            with conn:
+                conn.executemany(sql, rows)
+
+    def _insert(self, order_id: str, text: str, buttons: str) -> bool:
+        now = time.time()
+        with self._db_lock:
+            conn = self._db()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO outbox (order_id, text, buttons, status, next_attempt_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (order_id, text, buttons, PENDING, now, now, now),
+                )
+                return cursor.rowcount > 0
+
+    def _revive(self, order_id: str) -> bool:
+        now = time.time()
+        with self._db_lock:
+            conn = self._db()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? "
+                    "WHERE order_id = ? AND status = ?",
+                    (PENDING, now, now, order_id, DEAD),
+                )
+                return cursor.rowcount > 0
+
+    # --- Public API ---
+    async def enqueue(self, order_id: str, text: str, buttons: ButtonRows = ()) -> bool:
+        """Record a notification for order_id; returns False if one already exists."""
+        inserted = await asyncio.to_thread(
+            self._insert, str(order_id), text, dumps([[list(button) for button in row] for row in buttons])
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return inserted
+
+    async def dead_letters(self) -> List[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT order_id, attempts, last_error, message_id, updated_at FROM outbox "
+            "WHERE status = ? ORDER BY updated_at",
+            (DEAD,),
+        )
+        return [
+            {"order_id": r[0], "attempts": r[1], "last_error": r[2], "message_id": r[3], "updated_at": r[4]}
+            for r in rows
+        ]
+
+    async def requeue(self, order_id: str) -> bool:
+        """Give a dead-lettered job a fresh set of attempts; False if there is none."""
+        revived = await asyncio.to_thread(self._revive, str(order_id))
+        if revived and self._wakeup is not None:
+            self._wakeup.set()
+        return revived
+
+    async def counts(self) -> Dict[str, int]:
+        rows = await asyncio.to_thread(self._execute, "SELECT status, COUNT(*) FROM outbox GROUP BY status")
+        counts = {PENDING: 0, SENT: 0, DEAD: 0}
+        counts.update(dict(rows))
+        return counts
+
+    # --- Delivery ---
+    @staticmethod
+    def _markup(buttons: list) -> Optional[InlineKeyboardMarkup]:
+        if not buttons:
+            return None
+        return InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text=text, callback_data=data) for text, data in row]
+            for row in buttons
+        ])
+
+    async def _deliver(self, order_id: str, text: str, buttons: str, message_id: Optional[int]) -> Tuple[Optional[int], Optional[str], bool]:
+        """Run the remaining steps of one job: (message_id, error, permanent)."""
+        if message_id is None:
+            try:
+                sent = await self.bot.send_message(
+                    chat_id=self.chat_id,
+                    text=text,
+                    parse_mode="HTML",
+                    reply_markup=self._markup(loads(buttons))
+                )
+            except (TelegramBadRequest, TelegramForbiddenError) as e:
+                return None, str(e), True
+            except Exception as e:
+                return None, str(e) or type(e).__name__, False
+            message_id = sent.message_id
+            # Recorded before the backend step so a retry never posts twice
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE outbox SET message_id = ?, updated_at = ? WHERE order_id = ?",
+                (message_id, time.time(), order_id),
+            )
+
+        res = await api_client.update_order_message_id(order_id, message_id)
+        if not _is_success(res):
+            return message_id, f"{res.get('error')}: {res.get('detail', '')}", False
+        return message_id, None, False
+
+    async def drain_once(self) -> int:
+        """Deliver one batch of due jobs; returns how many were attempted."""
+        now = time.time()
+        jobs = await asyncio.to_thread(
+            self._execute,
+            "SELECT order_id, text, buttons, attempts, message_id FROM outbox "
+            "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+            (PENDING, now, self.batch_size),
+        )
+        if not jobs:
+            return 0
+
+        results = await asyncio.gather(
+            *(self._deliver(order_id, text, buttons, message_id) for order_id, text, buttons, _, message_id in jobs)
+        )
+
+        now = time.time()
+        updates = []
+        for (order_id, _, _, attempts, _), (message_id, error, permanent) in zip(jobs, results):
+            attempts += 1
+            if error is None:
+                self.delivered += 1
+                updates.append((SENT, attempts, now, None, now, order_id))
+            elif permanent or attempts >= self.max_attempts:
+                self.dead_lettered += 1
+                logger.error(f"Admin notification for order {order_id} dead-lettered after {attempts} attempts: {error}")
+                updates.append((DEAD, attempts, now, error, now, order_id))
+            else:
+                self.retried += 1
+                delay = max(self.retry_base, backoff_delay(attempts, self.retry_base, self.retry_cap))
+                logger.warning(f"Admin notification for order {order_id} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+                updates.append((PENDING, attempts, now + delay, error, now, order_id))
+
+        await asyncio.to_thread(
+            self._executemany,
+            "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? "
+            "WHERE order_id = ?",
+            updates,
+        )
+        return len(jobs)
+
+    async def _prune(self):
+        cutoff = time.time() - self.retention_days * 86400
+        await asyncio.to_thread(self._execute, "DELETE FROM outbox WHERE status = ? AND updated_at < ?", (SENT, cutoff))
+
+    async def _drain_loop(self):
+        last_prune = 0.0
+        while True:
+            try:
+                # Keep going while full batches come back
+                while await self.drain_once() >= self.batch_size:
+                    pass
+                if time.monotonic() - last_prune > 3600:
+                    await self._prune()
+                    last_prune = time.monotonic()
+                self.status_counts = await self.counts()
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, bot: Bot):
+        """Start the background drainer; jobs left from a previous run are picked up too."""
+        self.bot = bot
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain_loop())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+order_outbox = NotificationOutbox(
+    OUTBOX_DB_PATH,
+    ADMIN_GROUP_ID,
+    batch_size=OUTBOX_BATCH_SIZE,
+    poll_interval=OUTBOX_POLL_INTERVAL,
+    max_attempts=OUTBOX_MAX_ATTEMPTS,
+    retry_base=OUTBOX_RETRY_BASE,
+    retry_cap=OUTBOX_RETRY_CAP,
+    retention_days=OUTBOX_RETENTION_DAYS,
+)
@@ -0,0 +1,175 @@
+"""
+Background product image pre-warming.
+
+Walks the catalog, downloads each product's first image, optionally
+downscales/recompresses it to Telegram photo limits and uploads it once to a
+private storage chat so the resulting file_id is cached before any user opens
+the product. Products already in the file_id cache are skipped, which makes
+an interrupted run resumable.
+"""
+
+import asyncio
+import io
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile
+
+from data.config import (
+    IMAGE_STORAGE_CHAT_ID, PREWARM_CONCURRENCY, PREWARM_RECOMPRESS,
+    PREWARM_MAX_SIDE, PREWARM_JPEG_QUALITY
+)
+from utils.api import api_client
+from utils.catalog import catalog_index
+from utils.media import file_id_cache, image_fetcher
+
+try:
+    from PIL import Image
+except ImportError:  # Images are uploaded as is without Pillow
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Telegram sendPhoto limits
+TELEGRAM_PHOTO_MAX_BYTES = 10 * 1024 * 1024
+TELEGRAM_PHOTO_MAX_DIMENSIONS = 10000
+
+PROGRESS_LOG_EVERY = 50
+
+
+def _to_rgb(img: "Image.Image") -> "Image.Image":
+    """Drop transparency onto white; a plain convert would turn it black in JPEG."""
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def prepare_photo(data: bytes) -> bytes:
+    """Downscale and recompress to JPEG if Pillow is available and it helps."""
+    if Image is None or not PREWARM_RECOMPRESS:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            too_large = len(data) > TELEGRAM_PHOTO_MAX_BYTES
+            too_big = max(img.size) > PREWARM_MAX_SIDE or sum(img.size) > TELEGRAM_PHOTO_MAX_DIMENSIONS
+            if not (too_large or too_big or img.format != "JPEG"):
+                return data
+            img = _to_rgb(img)
+            img.thumbnail((PREWARM_MAX_SIDE, PREWARM_MAX_SIDE))
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=PREWARM_JPEG_QUALITY, optimize=True)
+            return out.getvalue()
+    except Exception as e:
+        logger.warning(f"Could not recompress image: {e}")
+        return data
+
+
+class ImagePrewarmer:
+    def __init__(self, storage_chat_id: Optional[int] = IMAGE_STORAGE_CHAT_ID, concurrency: int = PREWARM_CONCURRENCY):
+        self.storage_chat_id = storage_chat_id
+        self.concurrency = concurrency
+        self.bot: Optional[Bot] = None
+        self.progress: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _group_ids(self) -> List[str]:
+        if catalog_index.ready:
+            return list(catalog_index.groups_by_id)
+
+        group_ids: Dict[str, None] = {}
+        pending: List[Optional[str]] = [None]
+        while pending:
+            parent_id = pending.pop()
+            res = await api_client.get_groups(parent_id=parent_id)
+            for group in res.get("items", []):
+                if group["id"] not in group_ids:
+                    group_ids[group["id"]] = None
+                    pending.append(group["id"])
+        return list(group_ids)
+
+    async def _products(self) -> List[Dict[str, Any]]:
+        products: Dict[str, Dict[str, Any]] = {}
+        for group_id in await self._group_ids():
+            res = await api_client.get_products(group_id=group_id)
+            for product in res.get("items", []):
+                products[str(product["id"])] = product
+        return list(products.values())
+
+    async def _warm_one(self, product: Dict[str, Any], semaphore: asyncio.Semaphore):
+        key = str(product["id"])
+        img_url = product["images"][0]
+        async with semaphore:
+            data = await image_fetcher.fetch(img_url)
+            if data is None:
+                self.progress["failed"] += 1
+                return
+            data = await asyncio.to_thread(prepare_photo, data)
+            try:
+                sent = await self.bot.send_photo(
+                    chat_id=self.storage_chat_id,
+                    photo=BufferedInputFile(data, filename="product.jpg"),
+                    caption=key,
+                    disable_notification=True
+                )
+                file_id_cache.set(key, img_url, sent.photo[-1].file_id)
+                self.progress["uploaded"] += 1
+            except Exception as e:
+                logger.warning(f"Prewarm upload failed for product {key}: {e}")
+                self.progress["failed"] += 1
+
+        done = self.progress["uploaded"] + self.progress["failed"]
+        if done % PROGRESS_LOG_EVERY == 0:
+            # Checkpoint so an interrupted run resumes from here
+            await file_id_cache.flush()
+            logger.info(f"Image prewarm progress: {done}/{self.progress['pending']} ({self.progress})")
+
+    async def run(self):
+        """Warm every product image not yet in the file_id cache."""
+        started = time.monotonic()
+        products = [p for p in await self._products() if p.get("images") and p["images"][0]]
+        pending = [p for p in products if not file_id_cache.contains(str(p["id"]), p["images"][0])]
+        self.progress = {
+            "total": len(products),
+            "skipped": len(products) - len(pending),
+            "pending": len(pending),
+            "uploaded": 0,
+            "failed": 0,
+        }
+        logger.info(f"Image prewarm started: {self.progress}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            await asyncio.gather(*(self._warm_one(p, semaphore) for p in pending))
+        finally:
+            await file_id_cache.flush()
+        logger.info(f"Image prewarm finished in {time.monotonic() - started:.1f}s: {self.progress}")
+
+    def schedule(self, bot: Bot):
+        """Start a run in the background unless one is already in progress."""
+        if not self.storage_chat_id:
+            return
+        self.bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_logged())
+
+    async def _run_logged(self):
+        try:
+            await self.run()
+        except Exception as e:
+            logger.error(f"Image prewarm failed: {e}")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+image_prewarmer = ImagePrewarmer()
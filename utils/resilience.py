@@ -0,0 +1,188 @@
+"""
+Backend call protection: per-endpoint timeouts, a retry budget and a
+circuit breaker.
+"""
+
+import logging
+import random
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TimeoutPolicy:
+    """Timeout per request, picked by the longest matching "METHOD /path" prefix."""
+
+    def __init__(self, default: float, overrides: Sequence[Tuple[str, float]] = ()):
+        self.default = default
+        # Longest prefix first so "/products/" beats "/products"
+        self.overrides = sorted(overrides, key=lambda item: len(item[0]), reverse=True)
+
+    def for_request(self, method: str, path: str) -> float:
+        target = f"{method} {path}"
+        for prefix, seconds in self.overrides:
+            if target.startswith(prefix):
+                return seconds
+        return self.default
+
+
+class RetryBudget:
+    """Caps retries to a fraction of traffic so retries cannot amplify an outage.
+
+    Every request deposits `ratio` tokens, every retry withdraws one. A small
+    trickle of `min_per_second` retries is always allowed for low traffic.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, cap: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.cap = cap
+        # Ten seconds' worth of the minimum rate to start with
+        self.balance = min(cap, min_per_second * 10)
+        self._refilled_at = time.monotonic()
+        self.exhausted = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.balance = min(self.cap, self.balance + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+
+    def deposit(self):
+        self._refill()
+        self.balance = min(self.cap, self.balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self.balance >= 1.0:
+            self.balance -= 1.0
+            return True
+        self.exhausted += 1
+        return False
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class Permit:
+    """Handed out by CircuitBreaker.allow(); passed back with the call's outcome."""
+
+    __slots__ = ("generation", "probe")
+
+    def __init__(self, generation: int, probe: bool = False):
+        self.generation = generation
+        self.probe = probe
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a sliding time window.
+
+    closed    -> open       when the error rate over `window` seconds reaches
+                            `error_threshold` with at least `min_requests` calls;
+    open      -> half_open  after `open_seconds`, letting one probe through;
+    half_open -> closed     on a successful probe, back to open on failure.
+
+    Every state change starts a new generation. Outcomes are only counted for
+    permits of the current generation, so a slow call started before the
+    breaker opened cannot close or re-open it later, and only the probe's own
+    permit decides the half-open state.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        error_threshold: float = 0.5,
+        min_requests: int = 20,
+        window: float = 30.0,
+        open_seconds: float = 15.0,
+        name: str = "backend",
+    ):
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.window = window
+        self.open_seconds = open_seconds
+        self.name = name
+        self.state = self.CLOSED
+        self._generation = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._errors = 0
+        self._opened_at = 0.0
+        self._probe: Optional[Permit] = None
+        self._listeners: List[Callable[[str, str], None]] = []
+        self.rejected = 0
+
+    def add_listener(self, callback: Callable[[str, str], None]):
+        """Register callback(old_state, new_state) for state transitions."""
+        self._listeners.append(callback)
+
+    def _transition(self, new_state: str):
+        old_state, self.state = self.state, new_state
+        self._generation += 1
+        self._probe = None
+        self._outcomes.clear()
+        self._errors = 0
+        logger.warning(f"Circuit breaker '{self.name}': {old_state} -> {new_state}")
+        for callback in self._listeners:
+            try:
+                callback(old_state, new_state)
+            except Exception as e:
+                logger.error(f"Circuit breaker listener failed: {e}")
+
+    def allow(self) -> Optional[Permit]:
+        """A permit if a call may go out now, None to fail fast."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return None
+            self._transition(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probe is not None:
+                self.rejected += 1
+                return None
+            self._probe = Permit(self._generation, probe=True)
+            return self._probe
+        return Permit(self._generation)
+
+    def abandon(self, permit: Permit):
+        """Call finished without an outcome (e.g. cancelled); frees the half-open probe slot."""
+        if permit is self._probe:
+            self._probe = None
+
+    def record(self, permit: Permit, success: bool):
+        if permit.generation != self._generation:
+            return  # Started before the last state change
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            if permit is not self._probe:
+                return
+            if success:
+                self._transition(self.CLOSED)
+            else:
+                self._opened_at = now
+                self._transition(self.OPEN)
+            return
+
+        self._outcomes.append((now, success))
+        if not success:
+            self._errors += 1
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, ok = self._outcomes.popleft()
+            if not ok:
+                self._errors -= 1
+
+        if self.state == self.CLOSED and len(self._outcomes) >= self.min_requests:
+            if self._errors / len(self._outcomes) >= self.error_threshold:
+                self._opened_at = now
+                self._transition(self.OPEN)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._errors / len(self._outcomes)
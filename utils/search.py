@@ -0,0 +1,347 @@
+"""
+Local multilingual product search over the catalog index.
+
+Names and descriptions in uz/ru/en are normalized to one Latin script
+(Uzbek and Russian Cyrillic are transliterated), tokenized and indexed for
+exact, prefix and trigram matching. Queries are answered in-process.
+
+Work per keystroke is bounded: the set of products matching every query word
+is narrowed rarest word first with set operations, and at most
+MAX_CANDIDATES_PER_TOKEN of them are scored, taken best-score first from
+postings grouped by weight. Partial matches are only looked at when there are
+fewer full matches than requested.
+
+The index is built in a worker thread after each catalog refresh and swapped
+in at once; refreshes that did not change any product are skipped.
+"""
+
+import asyncio
+import logging
+import re
+import heapq
+import time
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from data.config import SEARCH_MAX_STALENESS
+from utils.catalog import catalog_index
+
+logger = logging.getLogger(__name__)
+
+# Uzbek and Russian Cyrillic -> Uzbek Latin
+CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+}
+_TRANSLIT_TABLE = str.maketrans(CYRILLIC_TO_LATIN)
+# O‘zbek apostrophes (o‘, g‘, tutuq belgisi) are dropped so all spellings meet
+_APOSTROPHES = re.compile(r"['‘’ʻʼ`]")
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+NAME_FIELDS = ("name_uz", "name_ru", "name_en", "name")
+DESCRIPTION_FIELDS = ("description_uz", "description_ru", "description_en", "description")
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+EXACT_BONUS = 3.0
+PREFIX_BONUS = 2.0
+MIN_TRIGRAM_SIMILARITY = 0.4
+MAX_PREFIX_EXPANSIONS = 200
+MAX_CANDIDATES_PER_TOKEN = 300
+QUERY_CACHE_SIZE = 1024
+
+
+def normalize(text: str) -> str:
+    """Lowercase, transliterate to Latin and collapse punctuation to spaces."""
+    text = text.lower().translate(_TRANSLIT_TABLE)
+    text = _APOSTROPHES.sub("", text)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Tables:
+    """Everything a query reads, built off the event loop and swapped in as one object."""
+
+    __slots__ = ("products", "postings", "weight_runs", "vocabulary", "trigram_index", "gram_counts")
+
+    def __init__(self, products, postings, weight_runs, vocabulary, trigram_index, gram_counts):
+        self.products: Dict[str, Dict[str, Any]] = products
+        self.postings: Dict[str, Dict[str, float]] = postings
+        # Same postings grouped as (weight, product ids) runs
+        self.weight_runs: Dict[str, List[Tuple[float, List[str]]]] = weight_runs
+        self.vocabulary: List[str] = vocabulary
+        self.trigram_index: Dict[str, Set[str]] = trigram_index
+        self.gram_counts: Dict[str, int] = gram_counts
+
+
+def build_tables(products: Dict[str, Dict[str, Any]]) -> _Tables:
+    """Index products; pure CPU work, safe to run in a thread."""
+    postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for product_id, product in products.items():
+        for fields, weight in ((NAME_FIELDS, NAME_WEIGHT), (DESCRIPTION_FIELDS, DESCRIPTION_WEIGHT)):
+            for field in fields:
+                value = product.get(field)
+                if not value:
+                    continue
+                for token in tokenize(str(value)):
+                    if postings[token].get(product_id, 0) < weight:
+                        postings[token][product_id] = weight
+
+    trigram_index: Dict[str, Set[str]] = defaultdict(set)
+    gram_counts: Dict[str, int] = {}
+    for token in postings:
+        grams = trigrams(token)
+        gram_counts[token] = len(grams)
+        for gram in grams:
+            trigram_index[gram].add(token)
+
+    weight_runs: Dict[str, List[Tuple[float, List[str]]]] = {}
+    for token, entries in postings.items():
+        runs: Dict[float, List[str]] = defaultdict(list)
+        for product_id, weight in entries.items():
+            runs[weight].append(product_id)
+        weight_runs[token] = list(runs.items())
+    return _Tables(products, dict(postings), weight_runs, sorted(postings), dict(trigram_index), gram_counts)
+
+
+class SearchIndex:
+    def __init__(self):
+        self.tables = _Tables({}, {}, {}, [], {}, {})
+        self.version = 0
+        # Telegram sends the same prefixes for every user typing a popular word
+        self._query_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._pending: Optional[Tuple[Dict[str, Dict[str, Any]], int]] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    @property
+    def products(self) -> Dict[str, Dict[str, Any]]:
+        return self.tables.products
+
+    def _swap(self, tables: _Tables, version: int):
+        self.tables = tables
+        self.version = version
+        self._query_cache.clear()
+
+    def build(self, products: Dict[str, Dict[str, Any]], version: int = 0):
+        """Index products and swap the new tables in (blocking)."""
+        self._swap(build_tables(products), version)
+
+    def rebuild(self):
+        """Catalog listener: rebuild from the new snapshot in the background."""
+        # The catalog swaps in new dicts on refresh and never mutates a snapshot
+        self._pending = (catalog_index.products_by_id, catalog_index.version)
+        if self._rebuild_task is None or self._rebuild_task.done():
+            self._rebuild_task = asyncio.create_task(self._rebuild_pending())
+
+    async def _rebuild_pending(self):
+        # Snapshots arriving while a build runs collapse into one follow-up build
+        while self._pending is not None:
+            products, version = self._pending
+            self._pending = None
+            current = self.tables
+            started = time.perf_counter()
+            try:
+                tables = await asyncio.to_thread(self._build_if_changed, products, current.products)
+            except Exception as e:
+                logger.error(f"Search index build failed, keeping previous index: {e}")
+                continue
+            if tables is None:
+                # Same products: the index is still valid for the new catalog version
+                self.version = version
+                logger.info("Search index unchanged, rebuild skipped")
+                continue
+            self._swap(tables, version)
+            logger.info(
+                f"Search index built: {len(tables.products)} products, {len(tables.vocabulary)} tokens "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+
+    @staticmethod
+    def _build_if_changed(products, current_products) -> Optional[_Tables]:
+        if current_products and products == current_products:
+            return None
+        return build_tables(products)
+
+    def is_stale(self) -> bool:
+        if not catalog_index.ready or not self.products:
+            return True
+        if self.version != catalog_index.version:
+            # Keep answering from the previous snapshot while the new one builds
+            rebuilding = self._rebuild_task is not None and not self._rebuild_task.done()
+            if not rebuilding:
+                return True
+        return time.monotonic() - catalog_index.loaded_at > SEARCH_MAX_STALENESS
+
+    def _prefix_matches(self, tables: _Tables, prefix: str) -> List[str]:
+        vocabulary = tables.vocabulary
+        matches = []
+        i = bisect_left(vocabulary, prefix)
+        while i < len(vocabulary) and len(matches) < MAX_PREFIX_EXPANSIONS:
+            token = vocabulary[i]
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+            i += 1
+        return matches
+
+    def _sources(self, tables: _Tables, query_token: str) -> List[Tuple[float, str]]:
+        """Indexed tokens one query token matches, as (score factor, token)."""
+        sources = []
+        if query_token in tables.postings:
+            sources.append((EXACT_BONUS, query_token))
+        prefix_matches = self._prefix_matches(tables, query_token)
+        for token in prefix_matches:
+            if token != query_token:
+                sources.append((PREFIX_BONUS, token))
+
+        # Typo tolerance is a fallback: fuzzy factors are below the prefix bonus,
+        # so skip it when exact and prefix matches already fill the candidate budget
+        matched_postings = sum(len(tables.postings[token]) for _, token in sources)
+        if len(query_token) >= 3 and matched_postings < MAX_CANDIDATES_PER_TOKEN:
+            query_grams = trigrams(query_token)
+            shared = Counter(chain.from_iterable(tables.trigram_index.get(gram, ()) for gram in query_grams))
+            seen = set(prefix_matches)
+            for token, count in shared.items():
+                if token in seen:
+                    continue  # Already scored higher as exact/prefix
+                similarity = count / (len(query_grams) + tables.gram_counts[token] - count)
+                if similarity >= MIN_TRIGRAM_SIMILARITY:
+                    sources.append((similarity, token))
+        return sources
+
+    @staticmethod
+    def _top_candidates(
+        tables: _Tables, sources: List[Tuple[float, str]], within: Optional[Set[str]] = None
+    ) -> Dict[str, float]:
+        """Best-scoring products for a query token, at most MAX_CANDIDATES_PER_TOKEN."""
+        runs = [(weight * factor, ids) for factor, token in sources for weight, ids in tables.weight_runs[token]]
+        runs.sort(key=itemgetter(0), reverse=True)
+        scores: Dict[str, float] = {}
+        # Highest-scoring runs first, so the first score seen per product is its best
+        for score, ids in runs:
+            for product_id in ids:
+                if product_id not in scores and (within is None or product_id in within):
+                    scores[product_id] = score
+                    if len(scores) >= MAX_CANDIDATES_PER_TOKEN:
+                        return scores
+        return scores
+
+    @staticmethod
+    def _matching(tables: _Tables, sources: List[Tuple[float, str]], within: Set[str]) -> Set[str]:
+        """Products in `within` that a query token matches."""
+        found: Set[str] = set()
+        for _, token in sources:
+            postings = tables.postings[token]
+            if len(postings) < len(within):
+                found.update(within.intersection(postings))
+            else:
+                found.update(pid for pid in within if pid in postings)
+        return found
+
+    @staticmethod
+    def _score_candidates(
+        tables: _Tables, sources: List[Tuple[float, str]], candidates: Dict[str, float]
+    ) -> Dict[str, float]:
+        """Best score of a query token for products already found by other tokens."""
+        scores: Dict[str, float] = {}
+        for factor, token in sources:
+            postings = tables.postings[token]
+            # Walk whichever side is smaller
+            if len(postings) < len(candidates):
+                pairs = ((pid, weight) for pid, weight in postings.items() if pid in candidates)
+            else:
+                pairs = ((pid, postings[pid]) for pid in candidates if pid in postings)
+            for product_id, weight in pairs:
+                score = weight * factor
+                if score > scores.get(product_id, 0):
+                    scores[product_id] = score
+        return scores
+
+    @property
+    def query_cache_size(self) -> int:
+        return len(self._query_cache)
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Return products ranked by relevance to the query."""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        cache_key = (tuple(query_tokens), limit)
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            self._query_cache.move_to_end(cache_key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        tables = self.tables
+        token_sources = [self._sources(tables, query_token) for query_token in query_tokens]
+        # Rarest words first: they seed a small candidate set for the common ones
+        token_sources.sort(key=lambda sources: sum(len(tables.postings[token]) for _, token in sources))
+
+        rarest, others = token_sources[0], token_sources[1:]
+        full: Optional[Set[str]] = None
+        if others:
+            full = set().union(*(tables.postings[token] for _, token in rarest))
+            for sources in others:
+                if not full:
+                    break
+                full = self._matching(tables, sources, full)
+
+        totals: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, int] = defaultdict(int)
+        # Full matches, best-scoring by the rarest word first
+        candidates = self._top_candidates(tables, rarest, within=full)
+        for product_id, score in candidates.items():
+            totals[product_id] = score
+            matched[product_id] = 1
+        for sources in others:
+            for product_id, score in self._score_candidates(tables, sources, candidates).items():
+                totals[product_id] += score
+                matched[product_id] += 1
+
+        if others and len(candidates) < limit:
+            # Too few products match every word: fill with the best partial matches
+            for sources in token_sources:
+                for product_id, score in self._top_candidates(tables, sources).items():
+                    if product_id not in candidates:
+                        totals[product_id] += score
+                        matched[product_id] += 1
+
+        # Products matching every query word first, then by score
+        ranked = heapq.nlargest(limit, totals, key=lambda pid: (matched[pid], totals[pid]))
+        results = [tables.products[pid] for pid in ranked]
+
+        self._query_cache[cache_key] = results
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return results
+
+
+search_index = SearchIndex()
+catalog_index.add_listener(search_index.rebuild)
+
+
+def local_search(query: str, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    """Search locally, or return None when the index is missing or stale."""
+    if search_index.is_stale():
+        return None
+    return search_index.search(query, limit=limit)
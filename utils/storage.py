@@ -0,0 +1,228 @@
+"""
+SQLite-backed FSM storage with an in-memory hot layer.
+
+Reads and writes go to a dict, exactly like aiogram's MemoryStorage. Changed
+keys are flushed to SQLite in batches every `flush_interval` seconds from a
+worker thread, so carts, languages and tokens survive restarts without
+putting disk I/O on the update path. Recently active users are loaded back
+into memory on boot.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from copy import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from utils.json_codec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+SYNCHRONOUS_LEVELS = {"off": "OFF", "normal": "NORMAL", "full": "FULL"}
+
+
+class _Record:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None, updated_at: float = 0.0):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.updated_at = updated_at
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 1.0,
+        durability: str = "normal",
+        hot_max: int = 50000,
+        warmup_hours: float = 24.0,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.durability = SYNCHRONOUS_LEVELS.get(durability.lower(), "NORMAL")
+        self.hot_max = hot_max
+        self.warmup_hours = warmup_hours
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        self._hot: "OrderedDict[str, _Record]" = OrderedDict()
+        self._dirty: Dict[str, None] = {}
+        # Keys of the batch being written right now; evicting them could re-read stale rows
+        self._flushing: Dict[str, None] = {}
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={self.durability}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fsm_updated_at ON fsm (updated_at)")
+        self._conn.commit()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # --- Hot layer ---
+    def _select(self, db_key: str):
+        with self._db_lock:
+            return self._conn.execute("SELECT state, data, updated_at FROM fsm WHERE key = ?", (db_key,)).fetchone()
+
+    async def _record(self, key: StorageKey) -> _Record:
+        db_key = self.key_builder.build(key)
+        record = self._hot.get(db_key)
+        if record is not None:
+            self._hot.move_to_end(db_key)
+            return record
+
+        # Cold key: single primary-key lookup off the event loop, since the
+        # flush thread may be holding the lock
+        row = await asyncio.to_thread(self._select, db_key)
+        record = self._hot.get(db_key)
+        if record is not None:
+            # Loaded (and maybe changed) by a concurrent call while we waited
+            self._hot.move_to_end(db_key)
+            return record
+        record = _Record(row[0], loads(row[1]), row[2]) if row else _Record()
+        self._hot[db_key] = record
+        self._evict()
+        return record
+
+    def _touch(self, key: StorageKey, record: _Record):
+        record.updated_at = time.time()
+        self._dirty[self.key_builder.build(key)] = None
+
+    def _evict(self):
+        """Drop least recently used clean records beyond hot_max.
+
+        Records that are dirty or part of an in-flight flush are kept: until
+        the batch commits, SQLite still holds their previous version.
+        """
+        if len(self._hot) <= self.hot_max:
+            return
+        for db_key in list(self._hot):
+            if len(self._hot) <= self.hot_max:
+                break
+            if db_key not in self._dirty and db_key not in self._flushing:
+                del self._hot[db_key]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record.data = data.copy()
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key)).data.copy()
+
+    async def get_value(self, storage_key: StorageKey, dict_key: str, default: Optional[Any] = None) -> Optional[Any]:
+        return copy((await self._record(storage_key)).data.get(dict_key, default))
+
+    # --- Persistence ---
+    def _write_batch(self, upserts: List[Tuple[str, Optional[str], str, float]], deletes: List[Tuple[str]]):
+        with self._db_lock:
+            with self._conn:
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                        upserts,
+                    )
+                if deletes:
+                    self._conn.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+
+    def _serialize(self, dirty: Dict[str, None]):
+        upserts, deletes = [], []
+        for db_key in dirty:
+            record = self._hot.get(db_key)
+            if record is None:
+                continue
+            if record.state is None and not record.data:
+                deletes.append((db_key,))
+                continue
+            try:
+                raw = dumps(record.data)
+            except Exception as e:
+                # Skip it rather than hold back the rest of the batch. It is not
+                # re-dirtied, so it is logged once and stays evictable; the
+                # next set_state/set_data on the key marks it dirty again.
+                logger.error(f"FSM data for {db_key} is not JSON serializable, not persisted: {e}")
+                continue
+            upserts.append((db_key, record.state, raw, record.updated_at))
+        return upserts, deletes
+
+    async def flush(self):
+        """Write all changed records to SQLite in one transaction."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        self._flushing = dirty
+        try:
+            upserts, deletes = self._serialize(dirty)
+            await asyncio.to_thread(self._write_batch, upserts, deletes)
+        except Exception as e:
+            logger.error(f"FSM flush failed, will retry: {e}")
+            for db_key in dirty:
+                self._dirty.setdefault(db_key, None)
+        finally:
+            self._flushing = {}
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f"FSM flush loop error: {e}")
+
+    def warmup(self) -> int:
+        """Load recently active users into the hot layer."""
+        since = time.time() - self.warmup_hours * 3600
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT key, state, data, updated_at FROM fsm WHERE updated_at >= ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (since, self.hot_max),
+            ).fetchall()
+        for db_key, state, raw, updated_at in reversed(rows):
+            self._hot[db_key] = _Record(state, loads(raw), updated_at)
+        return len(rows)
+
+    async def start(self):
+        """Warm up the hot set and start the write-behind flusher."""
+        loaded = await asyncio.to_thread(self.warmup)
+        logger.info(f"FSM storage warmed up with {loaded} records from {self.path}")
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+    @property
+    def pending_writes(self) -> int:
+        """Changed records waiting for the next flush."""
+        return len(self._dirty)